@@ -1,8 +1,10 @@
 # Arquivo: agents/analysis_agent.py
 import logging
 from typing import Dict, Any
-import google.generativeai as genai
-import os
+
+from tools.tracing import start_span
+from tools.llm_client import get_llm_client, LLMError
+from tools.task_control import current_task_control
 
 logger = logging.getLogger('AnalysisAgent')
 
@@ -13,11 +15,10 @@ class AnalysisAgent:
     """
 
     def __init__(self):
-        # Inicialize o LLM (modelo e configurações) aqui.
-        # Configura a chave da API do Gemini
-        genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-        self.model = genai.GenerativeModel(model_name=os.getenv("LLM_MODEL", "gemini-pro"))
-        logger.info("AnalysisAgent inicializado com o modelo Gemini: %s", os.getenv("LLM_MODEL", "gemini-pro"))
+        # Cliente compartilhado do processo: rate limit global, retentativas e hedging
+        self.llm = get_llm_client()
+        logger.info("AnalysisAgent inicializado com o modelo: %s (%s)", self.llm.model_name, self.llm.provider.name,
+                    extra={'task_id': '-'})
 
     def execute(self, input_data: Dict[str, Any], user_request: str, command: str, task_id: str) -> Dict[str, Any]:
         """Executa a tarefa de análise, usando o contexto e a requisição do usuário."""
@@ -59,12 +60,19 @@ class AnalysisAgent:
             
             try:
                 # Chamar o LLM
-                response = self.model.generate_content(prompt)
-                final_answer = response.text
+                with start_span("llm.generate", **{"llm.model": self.llm.model_name, "llm.prompt_chars": len(prompt)}) as span:
+                    # O prazo da tarefa limita retentativas/backoff; o cancelamento é checado a cada tentativa
+                    control = current_task_control()
+                    response = self.llm.generate(prompt, task_id=task_id,
+                                                 deadline=control.monotonic_deadline() if control else None,
+                                                 cancel_check=control.check if control else None)
+                    final_answer = response.text
+                    span.set_attributes(**{f"llm.{key}": value for key, value in response.usage.items()})
                 logger.info("Análise concluída pelo LLM. Resultado final pronto para Delivery.", extra=extra_data)
-            except Exception as e:
-                logger.error("Erro ao chamar o LLM Gemini: %s", str(e), extra=extra_data)
-                final_answer = "Desculpe, não foi possível gerar uma resposta devido a um erro interno."
+            except LLMError as e:
+                # Não entregar uma resposta "enlatada" como se fosse a análise: a tarefa falha
+                logger.error("Erro ao chamar o LLM: %s", str(e), extra=extra_data)
+                return {"status": "error", "message": f"LLM call failed: {e}"}
             
             # Retorna o resultado para o DeliveryAgent
             return {
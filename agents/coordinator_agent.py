@@ -3,14 +3,35 @@ import yaml
 import os
 import json
 import time
-from typing import Dict, Any
+import importlib
+import threading
+from contextlib import nullcontext
+from typing import Dict, Any, List, Tuple, Callable
 
-# Importa as classes dos agentes irmãos (a serem criadas)
-# Assumindo que você terá classes básicas para cada agente
-from .extraction_agent import ExtractionAgent
-from .analysis_agent import AnalysisAgent
-from .delivery_agent import DeliveryAgent
-from .memory_agent import MemoryAgent # (Opcional, se o workflow exigir)
+from tools.tracing import start_span, current_span
+from tools.profiler import TaskProfiler, should_profile
+from tools.checkpoint_store import get_checkpoint_store
+from tools.task_control import TaskControl, TaskCancelled, DeadlineExceeded, task_control_scope
+
+# As classes dos agentes NÃO são importadas aqui: elas arrastam chromadb,
+# sentence_transformers (torch) e google.generativeai. Cada módulo é importado
+# sob demanda no primeiro uso (ou pré-carregado em background pelo main.py),
+# para que o worker possa começar a escutar a fila em ~1s.
+# Mapeamento do nome do agente no YAML para (módulo, classe).
+AGENT_MODULES = {
+    "ExtractionAgent": ("agents.extraction_agent", "ExtractionAgent"),
+    "AnalysisAgent": ("agents.analysis_agent", "AnalysisAgent"),
+    "DeliveryAgent": ("agents.delivery_agent", "DeliveryAgent"),
+    # Adicione outros agentes aqui:
+    "MemoryAgent": ("agents.memory_agent", "MemoryAgent"),
+}
+
+# Cache das classes já importadas ("agentes aquecidos")
+_agent_classes: Dict[str, type] = {}
+# Um lock por agente: importar um agente pesado (ex.: o MemoryAgent, com torch)
+# no preload não bloqueia a importação dos demais
+_agent_locks: Dict[str, threading.Lock] = {}
+_agent_locks_guard = threading.Lock()
 
 
 # --- 1. Configuração do Logging (Carregamento) ---
@@ -48,29 +69,105 @@ def load_workflow_config(workflow_name: str) -> Dict[str, Any] | None:
         print(f"ERRO: Workflow '{workflow_name}' não encontrado.")
         return None
 
+def load_agent_class(agent_name: str) -> type:
+    """Importa (uma única vez) o módulo do agente e retorna a sua classe."""
+    AgentClass = _agent_classes.get(agent_name)
+    if AgentClass:
+        return AgentClass
+
+    target = AGENT_MODULES.get(agent_name)
+    if not target:
+        raise ValueError(f"Agente desconhecido no workflow: {agent_name}")
+
+    with _agent_locks_guard:
+        agent_lock = _agent_locks.setdefault(agent_name, threading.Lock())
+
+    with agent_lock:
+        if agent_name not in _agent_classes:
+            module_name, class_name = target
+            start = time.perf_counter()
+            module = importlib.import_module(module_name)
+            _agent_classes[agent_name] = getattr(module, class_name)
+            logger.info("Agente %s carregado em %.2fs.", agent_name, time.perf_counter() - start,
+                        extra={'task_id': '-'})
+        return _agent_classes[agent_name]
+
+def get_warm_agents() -> List[str]:
+    """Retorna os nomes dos agentes cujas dependências já foram importadas."""
+    return sorted(_agent_classes)
+
+def preload_agents(agent_names: List[str] | None = None) -> List[str]:
+    """
+    Importa antecipadamente os agentes informados (ou todos). Pensado para rodar
+    em uma thread de background depois que o worker já está consumindo a fila.
+    """
+    for agent_name in agent_names or list(AGENT_MODULES):
+        try:
+            load_agent_class(agent_name)
+        except Exception as e:
+            logger.error("Falha ao pré-carregar o agente %s: %s", agent_name, str(e),
+                         extra={'task_id': '-'})
+    return get_warm_agents()
+
 def get_agent_instance(agent_name: str):
     """Retorna a instância da classe do agente pelo nome."""
-    # Mapeamento do nome do agente no YAML para a classe Python
-    mapping = {
-        "ExtractionAgent": ExtractionAgent,
-        "AnalysisAgent": AnalysisAgent,
-        "DeliveryAgent": DeliveryAgent,
-        # Adicione outros agentes aqui:
-        "MemoryAgent": MemoryAgent,
-    }
-    AgentClass = mapping.get(agent_name)
-    if AgentClass:
-        # Retorna uma nova instância do agente (pode precisar de injeção de dependência real)
-        return AgentClass() 
-    raise ValueError(f"Agente desconhecido no workflow: {agent_name}")
+    AgentClass = load_agent_class(agent_name)
+    # Retorna uma nova instância do agente (pode precisar de injeção de dependência real)
+    return AgentClass()
+
+
+def find_resume_point(store, task_id: str, workflow_name: str, steps: List[Dict[str, Any]]) -> Tuple[int, Dict[str, Any] | None]:
+    """
+    Retorna (índice do primeiro passo sem checkpoint, saída do último passo concluído).
+    Só conta checkpoints contíguos, do mesmo workflow e do mesmo agente.
+    """
+    resume_from, last_output = 0, None
+    for step_index, step in enumerate(steps):
+        checkpoint = store.load(task_id, step_index)
+        if not checkpoint or checkpoint.get("workflow") != workflow_name or checkpoint.get("agent") != step['agent']:
+            break
+        resume_from, last_output = step_index + 1, checkpoint["output"]
+    return resume_from, last_output
 
 
 # --- 3. Lógica Principal do Coordenador ---
 
-def process_task_from_api(task_payload: dict):
+def process_task_from_api(task_payload: dict, is_cancelled: Callable[[], bool] | None = None):
     """
     Recebe a tarefa do API Gateway, orquestra o fluxo de trabalho e gerencia o estado.
+    Toda a execução fica sob o span raiz 'task' (um trace por tarefa).
+    `task_payload['deadline']` (epoch) e `is_cancelled` (sinal do worker) são
+    verificados entre os passos e pelas chamadas de embeddings e LLM.
     """
+    control = TaskControl(deadline=task_payload.get("deadline"), is_cancelled=is_cancelled)
+    profiler = None
+    if should_profile(task_payload):
+        # Import tardio: o OUTPUT_DIR é o mesmo diretório onde o relatório é salvo
+        from .delivery_agent import OUTPUT_DIR
+        profiler = TaskProfiler(task_payload.get("task_id"), OUTPUT_DIR)
+        profiler.start()
+
+    result = None
+    try:
+        with start_span("task", **{"task.id": task_payload.get("task_id")}) as task_span, \
+             task_control_scope(control):
+            result = _run_pipeline(task_payload, profiler, control)
+            if result:
+                task_span.set_attribute("task.status", result.get("status"))
+                if result.get("status") != "success":
+                    task_span.error = result.get("message")
+    finally:
+        if profiler:
+            try:
+                profiler.stop_and_save(status=result.get("status") if result else None)
+            except Exception as e:
+                logger.error("Falha ao salvar o perfil da tarefa: %s", str(e),
+                             extra={'task_id': task_payload.get("task_id")})
+    return result
+
+def _run_pipeline(task_payload: dict, profiler: TaskProfiler | None = None, control: TaskControl | None = None):
+    """Executa o workflow selecionado, passo a passo (perfilando cada passo, se pedido)."""
+    control = control or TaskControl()
     task_id = task_payload.get("task_id")
     user_request = task_payload.get("user_request")
     file_path = task_payload.get("file_path")
@@ -95,38 +192,76 @@ def process_task_from_api(task_payload: dict):
         return
         
     logger.info("Fluxo de trabalho selecionado: %s", workflow_name, extra=extra_data)
+    task_span = current_span()
+    if task_span:
+        task_span.set_attribute("task.workflow", workflow_name)
     
     # 3. Execução do Pipeline Sequencial
     
     # Variável para rastrear o output entre os passos
     current_output = task_payload 
+    # Duração (s) de cada agente, usada pelo worker para publicar a vazão por etapa
+    step_timings: Dict[str, float] = {}
+    
+    # O workflow YAML deve ter uma lista de tarefas 'tasks_sequence'
+    steps = workflow_config.get('tasks_sequence', [])
+    
+    # Retomada: pula os passos que já têm checkpoint de uma execução anterior
+    checkpoint_store = get_checkpoint_store()
+    resume_from = 0
+    if checkpoint_store:
+        try:
+            resume_from, last_output = find_resume_point(checkpoint_store, task_id, workflow_name, steps)
+            if resume_from:
+                current_output = last_output
+                logger.info("Retomando do passo %d: %d passo(s) restaurados de checkpoint.",
+                            resume_from, resume_from, extra=extra_data)
+                if task_span:
+                    task_span.set_attribute("task.resumed_from_step", resume_from)
+        except Exception as e:
+            logger.warning("Falha ao ler checkpoints; executando do início: %s", str(e), extra=extra_data)
+            resume_from = 0
     
     try:
-        # O workflow YAML deve ter uma lista de tarefas 'tasks_sequence'
-        for step in workflow_config.get('tasks_sequence', []):
+        for step_index, step in enumerate(steps):
             agent_name = step['agent']
             command = step['command']
             
-            logger.info("Executando passo: Agente: %s, Comando: %s", agent_name, command, extra=extra_data)
-            
-            # 3.1. Instanciar o Agente
-            target_agent = get_agent_instance(agent_name)
+            if step_index < resume_from:
+                continue
             
-            # 3.2. Chamar o método de execução do Agente (simulação)
-            # Passamos o output do passo anterior e o contexto da solicitação
+            # Prazo esgotado ou cancelamento: não inicia mais nenhum passo
+            control.check()
             
-            # *** SIMULAÇÃO DE CHAMADA REAL ***
+            logger.info("Executando passo: Agente: %s, Comando: %s", agent_name, command, extra=extra_data)
             
-            # O Agente Coordenador passa o que o Agente precisa:
-            # - O payload atual (output do passo anterior)
-            # - O request original do usuário
+            step_start = time.perf_counter()
+            step_profile = profiler.step(step_index, agent_name, command) if profiler else nullcontext()
+            with step_profile, \
+                 start_span(f"step.{agent_name}", **{"step.index": step_index, "step.command": command}) as step_span:
+                # 3.1. Instanciar o Agente
+                target_agent = get_agent_instance(agent_name)
+                
+                # 3.2. Chamar o método de execução do Agente (simulação)
+                # Passamos o output do passo anterior e o contexto da solicitação
+                
+                # *** SIMULAÇÃO DE CHAMADA REAL ***
+                
+                # O Agente Coordenador passa o que o Agente precisa:
+                # - O payload atual (output do passo anterior)
+                # - O request original do usuário
+                
+                current_output = target_agent.execute(
+                    input_data=current_output, 
+                    user_request=user_request, 
+                    command=command,
+                    task_id=task_id
+                )
+                step_span.set_attribute("step.status", current_output.get('status'))
+                if current_output.get('status') == 'error':
+                    step_span.error = current_output.get('message')
             
-            current_output = target_agent.execute(
-                input_data=current_output, 
-                user_request=user_request, 
-                command=command,
-                task_id=task_id
-            )
+            step_timings[agent_name] = step_timings.get(agent_name, 0.0) + time.perf_counter() - step_start
             
             logger.info("Passo concluído. Saída do Agente %s: %s caracteres.", 
                         agent_name, len(str(current_output.get('output_data'))), extra=extra_data)
@@ -135,6 +270,17 @@ def process_task_from_api(task_payload: dict):
             if current_output.get('status') == 'error':
                  raise Exception(f"Erro reportado pelo {agent_name}: {current_output.get('message')}")
             
+            # 3.4. Checkpoint da saída (o último passo, a entrega, não precisa: é barato refazer)
+            if checkpoint_store and step_index < len(steps) - 1:
+                try:
+                    checkpoint_store.save(task_id, step_index, {
+                        "workflow": workflow_name,
+                        "agent": agent_name,
+                        "command": command,
+                        "output": current_output,
+                    })
+                except Exception as e:
+                    logger.warning("Falha ao salvar checkpoint do passo %d: %s", step_index, str(e), extra=extra_data)
         
         # 4. Sucesso Final
         final_result = current_output.get('output_data', 'Resultado final não formatado.')
@@ -143,14 +289,37 @@ def process_task_from_api(task_payload: dict):
         
         # TODO: Notificar o sistema de status/API de sucesso e armazenar o 'final_result' no DB de status.
         
-        return {"status": "success", "result": final_result}
+        if checkpoint_store:
+            try:
+                checkpoint_store.clear(task_id)
+            except Exception as e:
+                logger.warning("Falha ao remover checkpoints: %s", str(e), extra=extra_data)
+        
+        # Agentes com passos restaurados de checkpoint não rodaram por inteiro:
+        # seus tempos distorceriam a média por etapa publicada pelo worker
+        restored_agents = {step['agent'] for step in steps[:resume_from]}
+        timings = {agent: seconds for agent, seconds in step_timings.items() if agent not in restored_agents}
+        return {"status": "success", "result": final_result, "timings": timings}
         
+    except DeadlineExceeded as e:
+        logger.warning("Tarefa abandonada: %s", str(e), extra=extra_data)
+        return {"status": "expired", "message": str(e), "timings": step_timings}
+    
+    except TaskCancelled as e:
+        logger.warning("Tarefa interrompida: %s", str(e), extra=extra_data)
+        return {"status": "cancelled", "message": str(e), "timings": step_timings}
+    
     except Exception as e:
+        if control.expired():
+            # Ex.: o LLM falhou por timeout porque o prazo da tarefa acabou
+            logger.warning("Prazo da tarefa esgotado durante o passo: %s", str(e), extra=extra_data)
+            return {"status": "expired", "message": f"Prazo da tarefa esgotado: {e}", "timings": step_timings}
+        
         logger.error("ERRO CRÍTICO no pipeline de task %s: %s", task_id, str(e), extra=extra_data)
         
         # TODO: Notificar o sistema de status/API de erro.
         # TODO: Implementar lógica de rollback ou limpeza de arquivos temporários.
         
-        return {"status": "error", "message": str(e)}
+        return {"status": "error", "message": str(e), "timings": step_timings}
 
 # --- FIM do Agente Coordenador ---
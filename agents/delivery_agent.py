@@ -4,6 +4,8 @@ import json
 import os
 from typing import Dict, Any, Union
 
+from tools.tracing import start_span
+
 logger = logging.getLogger('DeliveryAgent')
 
 # Diretório para salvar os relatórios finais, acessível pelo API Gateway
@@ -41,8 +43,9 @@ class DeliveryAgent:
             output_file_path = os.path.join(OUTPUT_DIR, f"{task_id}.json")
             
             try:
-                with open(output_file_path, "w") as f:
-                    json.dump(final_json_report, f, indent=2)
+                with start_span("report.write", **{"report.path": output_file_path}):
+                    with open(output_file_path, "w") as f:
+                        json.dump(final_json_report, f, indent=2)
                 
                 logger.info(f"Relatório final da tarefa {task_id} salvo em {output_file_path}.", extra=extra_data)
 
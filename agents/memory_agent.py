@@ -5,6 +5,7 @@ import uuid
 
 # Importa a ferramenta de Vector DB que criamos
 from tools.vector_db_tool import VectorDBTool 
+from tools.task_control import TaskCancelled
 
 logger = logging.getLogger('MemoryAgent')
 
@@ -17,7 +18,7 @@ class MemoryAgent:
     def __init__(self):
         # O MemoryAgent deve ter uma instância da ferramenta de DB Vetorial
         self.db_tool = VectorDBTool()
-        logger.info("MemoryAgent inicializado com VectorDBTool.")
+        logger.info("MemoryAgent inicializado com VectorDBTool.", extra={'task_id': '-'})
 
     def execute(self, input_data: Dict[str, Any], user_request: str, command: str, task_id: str) -> Dict[str, Any]:
         """
@@ -43,6 +44,8 @@ class MemoryAgent:
                 try:
                     self.db_tool.add_documents(extracted_chunks, task_id, document_id)
                     logger.info("Chunks do documento atual adicionados ao Vector DB.", extra=extra_data)
+                except TaskCancelled:
+                    raise
                 except Exception as e:
                     logger.warning("Falha ao persistir chunks: %s", str(e), extra=extra_data)
 
@@ -0,0 +1,160 @@
+# Arquivo: benchmarks/embedding_benchmark.py
+"""
+Compara os backends de embeddings (tools/embedding_backends.py) em um corpus local.
+
+Para cada backend mede a vazão de encode (textos/s) e a qualidade de recuperação:
+cada consulta é um trecho retirado do meio de um chunk, e o chunk de origem é a
+resposta relevante (recall@k e MRR). Os deltas são reportados em relação ao
+backend de referência (torch, por padrão).
+
+Uso:
+    python -m benchmarks.embedding_benchmark --corpus data/input_pdfs
+    python -m benchmarks.embedding_benchmark --corpus docs/ --backends torch,onnx-int8,static --json out.json
+"""
+import argparse
+import glob
+import json
+import os
+import random
+import time
+from typing import Dict, Any, List, Tuple
+
+import numpy as np
+
+from tools.embedding_backends import BACKENDS, get_embedding_backend
+from tools.pdf_reader import PDFReaderTool
+
+
+def load_corpus(corpus_dir: str, chunk_size: int, max_chunks: int) -> List[str]:
+    """Lê .pdf, .txt e .md do diretório e divide em chunks, como o ExtractionAgent."""
+    chunks: List[str] = []
+    for path in sorted(glob.glob(os.path.join(corpus_dir, "**", "*"), recursive=True)):
+        extension = os.path.splitext(path)[1].lower()
+        if extension == ".pdf":
+            text = PDFReaderTool.read_pdf_content(path, task_id="benchmark")
+        elif extension in (".txt", ".md"):
+            with open(path, "r", encoding="utf-8", errors="ignore") as f:
+                text = f.read()
+        else:
+            continue
+        chunks.extend(chunk for chunk in PDFReaderTool.chunk_text(text, chunk_size=chunk_size) if chunk.strip())
+        if len(chunks) >= max_chunks:
+            break
+    return chunks[:max_chunks]
+
+
+def build_queries(chunks: List[str], n_queries: int, query_chars: int, seed: int) -> List[Tuple[str, int]]:
+    """Gera pares (consulta, índice do chunk relevante) a partir do próprio corpus."""
+    rng = random.Random(seed)
+    indices = rng.sample(range(len(chunks)), min(n_queries, len(chunks)))
+    queries = []
+    for index in indices:
+        chunk = chunks[index]
+        start = max(0, (len(chunk) - query_chars) // 2)
+        queries.append((chunk[start:start + query_chars], index))
+    return queries
+
+
+def _normalize(vectors: List[List[float]]) -> np.ndarray:
+    matrix = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.clip(norms, 1e-12, None)
+
+
+def evaluate_backend(backend_name: str, chunks: List[str], queries: List[Tuple[str, int]], k: int) -> Dict[str, Any]:
+    load_start = time.perf_counter()
+    backend = get_embedding_backend(backend_name)
+    load_seconds = time.perf_counter() - load_start
+
+    # Aquecimento (alocação de buffers, JIT do runtime) fora da medição
+    backend.encode(chunks[:8])
+
+    encode_start = time.perf_counter()
+    doc_vectors = _normalize(backend.encode(chunks))
+    encode_seconds = time.perf_counter() - encode_start
+
+    query_start = time.perf_counter()
+    query_vectors = _normalize(backend.encode([query for query, _ in queries]))
+    query_seconds = time.perf_counter() - query_start
+
+    scores = query_vectors @ doc_vectors.T
+    rankings = np.argsort(-scores, axis=1)
+
+    hits, reciprocal_ranks = 0, 0.0
+    top_k: List[List[int]] = []
+    for (_, relevant), ranking in zip(queries, rankings):
+        top_k.append(ranking[:k].tolist())
+        position = int(np.where(ranking == relevant)[0][0])
+        hits += position < k
+        reciprocal_ranks += 1.0 / (position + 1)
+
+    return {
+        "backend": backend_name,
+        "model": backend.model_name,
+        "dimension": int(doc_vectors.shape[1]),
+        "load_seconds": round(load_seconds, 3),
+        "docs_per_second": round(len(chunks) / encode_seconds, 1),
+        "queries_per_second": round(len(queries) / query_seconds, 1),
+        f"recall@{k}": round(hits / len(queries), 4),
+        "mrr": round(reciprocal_ranks / len(queries), 4),
+        "_top_k": top_k,
+    }
+
+
+def run_benchmark(chunks: List[str], queries: List[Tuple[str, int]], backends: List[str],
+                  reference: str, k: int) -> List[Dict[str, Any]]:
+    results = [evaluate_backend(name, chunks, queries, k) for name in backends]
+    baseline = next((r for r in results if r["backend"] == reference), results[0])
+
+    for result in results:
+        result["speedup_vs_reference"] = round(result["docs_per_second"] / baseline["docs_per_second"], 2)
+        result[f"recall@{k}_delta"] = round(result[f"recall@{k}"] - baseline[f"recall@{k}"], 4)
+        result["mrr_delta"] = round(result["mrr"] - baseline["mrr"], 4)
+        # Concordância com os top-k do backend de referência
+        overlaps = [len(set(a) & set(b)) / k for a, b in zip(result["_top_k"], baseline["_top_k"])]
+        result[f"top{k}_overlap_with_reference"] = round(sum(overlaps) / len(overlaps), 4)
+    for result in results:
+        del result["_top_k"]
+    return results
+
+
+def print_table(results: List[Dict[str, Any]], k: int) -> None:
+    columns = ["backend", "dimension", "docs_per_second", "speedup_vs_reference",
+               f"recall@{k}", f"recall@{k}_delta", "mrr", "mrr_delta", f"top{k}_overlap_with_reference"]
+    widths = [max(len(column), *(len(str(r[column])) for r in results)) for column in columns]
+    print("  ".join(column.ljust(width) for column, width in zip(columns, widths)))
+    for result in results:
+        print("  ".join(str(result[column]).ljust(width) for column, width in zip(columns, widths)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dos backends de embeddings.")
+    parser.add_argument("--corpus", required=True, help="Diretório com .pdf/.txt/.md")
+    parser.add_argument("--backends", default=",".join(BACKENDS), help="Lista separada por vírgulas")
+    parser.add_argument("--reference", default="torch", help="Backend usado como referência para os deltas")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--max-chunks", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--query-chars", type=int, default=200)
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="Salva os resultados neste arquivo")
+    args = parser.parse_args()
+
+    chunks = load_corpus(args.corpus, args.chunk_size, args.max_chunks)
+    if not chunks:
+        parser.error(f"Nenhum texto encontrado em {args.corpus}")
+    queries = build_queries(chunks, args.queries, args.query_chars, args.seed)
+
+    backends = [name.strip() for name in args.backends.split(",") if name.strip()]
+    results = run_benchmark(chunks, queries, backends, args.reference, args.k)
+
+    print(f"Corpus: {len(chunks)} chunks, {len(queries)} consultas, k={args.k}")
+    print_table(results, args.k)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+# Arquivo: benchmarks/fake_redis.py
+import asyncio
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+
+class InMemoryRedis:
+    """
+    Substituto local (thread-safe) do subconjunto da API do redis-py usado pelo
+    API Gateway e pelo worker: strings, hashes, listas (com BRPOP), sorted sets
+    e expiração. Valores são devolvidos como str, como com decode_responses=True.
+    Scripts Lua não são interpretados: quem usa `register_script` registra antes
+    um equivalente em Python com `emulate_script`.
+    """
+
+    script_emulations: Dict[str, Callable] = {}
+
+    def __init__(self):
+        self.data: Dict[str, Any] = {}
+        self._expires_at: Dict[str, float] = {}
+        self._lock = threading.RLock()
+        self._list_pushed = threading.Condition(self._lock)
+
+    # --- Utilidades ---
+    def _purge(self, key: str) -> None:
+        expires_at = self._expires_at.get(key)
+        if expires_at is not None and expires_at <= time.time():
+            self.data.pop(key, None)
+            self._expires_at.pop(key, None)
+
+    def _get(self, key: str, default=None):
+        self._purge(key)
+        return self.data.get(key, default)
+
+    def ping(self) -> bool:
+        return True
+
+    # --- Scripts ---
+    @classmethod
+    def emulate_script(cls, script: str, func: Callable[["InMemoryRedis", List[str], List[Any]], Any]) -> None:
+        """Associa ao script Lua uma função (cliente, keys, args) com o mesmo efeito."""
+        cls.script_emulations[script] = func
+
+    def register_script(self, script: str):
+        func = self.script_emulations.get(script)
+        if func is None:
+            raise NotImplementedError("Script Lua sem emulação registrada no InMemoryRedis.")
+
+        def run(keys=(), args=(), client=None):
+            # Atômico como no Redis: roda inteiro sob o lock do cliente
+            with self._lock:
+                return func(self, list(keys), list(args))
+        return run
+
+    # --- Chaves ---
+    def exists(self, *keys: str) -> int:
+        with self._lock:
+            return sum(self._get(key) is not None for key in keys)
+
+    def delete(self, *keys: str) -> int:
+        with self._lock:
+            removed = 0
+            for key in keys:
+                self._expires_at.pop(key, None)
+                removed += self.data.pop(key, None) is not None
+            return removed
+
+    def expire(self, key: str, seconds: float) -> bool:
+        with self._lock:
+            if self._get(key) is None:
+                return False
+            self._expires_at[key] = time.time() + seconds
+            return True
+
+    # --- Strings ---
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            return self._get(key)
+
+    def set(self, key: str, value: Any, nx: bool = False, ex: Optional[float] = None) -> Optional[bool]:
+        with self._lock:
+            if nx and self._get(key) is not None:
+                return None
+            self.data[key] = str(value)
+            self._expires_at.pop(key, None)
+            if ex:
+                self._expires_at[key] = time.time() + ex
+            return True
+
+    def incr(self, key: str, amount: int = 1) -> int:
+        with self._lock:
+            value = int(self._get(key, 0)) + amount
+            self.data[key] = str(value)
+            return value
+
+    # --- Hashes ---
+    def hset(self, key: str, field: Optional[str] = None, value: Any = None, mapping: Optional[Dict] = None) -> int:
+        with self._lock:
+            bucket = self._get(key)
+            if bucket is None:
+                bucket = self.data[key] = {}
+            items = dict(mapping or {})
+            if field is not None:
+                items[field] = value
+            added = sum(1 for f in items if f not in bucket)
+            bucket.update({f: str(v) for f, v in items.items()})
+            return added
+
+    def hget(self, key: str, field: str) -> Optional[str]:
+        with self._lock:
+            return self._get(key, {}).get(field)
+
+    def hdel(self, key: str, *fields: str) -> int:
+        with self._lock:
+            bucket = self._get(key, {})
+            return sum(bucket.pop(field, None) is not None for field in fields)
+
+    def hgetall(self, key: str) -> Dict[str, str]:
+        with self._lock:
+            return dict(self._get(key, {}))
+
+    def hincrby(self, key: str, field: str, amount: int = 1) -> int:
+        with self._lock:
+            bucket = self._get(key)
+            if bucket is None:
+                bucket = self.data[key] = {}
+            value = int(bucket.get(field, 0)) + amount
+            bucket[field] = str(value)
+            return value
+
+    # --- Listas ---
+    def lpush(self, key: str, *values: Any) -> int:
+        with self._lock:
+            items = self._get(key)
+            if items is None:
+                items = self.data[key] = []
+            for value in values:
+                items.insert(0, str(value))
+            self._list_pushed.notify_all()
+            return len(items)
+
+    def llen(self, key: str) -> int:
+        with self._lock:
+            return len(self._get(key, []))
+
+    def lrem(self, key: str, count: int, value: Any) -> int:
+        with self._lock:
+            items = self._get(key, [])
+            before = len(items)
+            items[:] = [item for item in items if item != str(value)]
+            return before - len(items)
+
+    def brpop(self, key: str, timeout: float = 0):
+        """Como no Redis: bloqueia até haver item (timeout=0 espera para sempre)."""
+        deadline = time.monotonic() + timeout if timeout else None
+        with self._list_pushed:
+            while True:
+                items = self._get(key)
+                if items:
+                    value = items.pop()
+                    return key, value
+                remaining = deadline - time.monotonic() if deadline else None
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._list_pushed.wait(remaining)
+
+    # --- Sorted sets ---
+    def zadd(self, key: str, mapping: Dict[str, float]) -> int:
+        with self._lock:
+            zset = self._get(key)
+            if zset is None:
+                zset = self.data[key] = {}
+            added = sum(1 for member in mapping if member not in zset)
+            zset.update({member: float(score) for member, score in mapping.items()})
+            return added
+
+    def zcount(self, key: str, minimum: float, maximum: float) -> int:
+        with self._lock:
+            return sum(1 for score in self._get(key, {}).values() if minimum <= score <= maximum)
+
+    def zremrangebyscore(self, key: str, minimum: float, maximum: float) -> int:
+        with self._lock:
+            zset = self._get(key, {})
+            doomed: List[str] = [m for m, score in zset.items() if minimum <= score <= maximum]
+            for member in doomed:
+                del zset[member]
+            return len(doomed)
+
+
+class AsyncInMemoryRedis:
+    """
+    Fachada assíncrona (API do redis.asyncio) sobre um InMemoryRedis, para o
+    API Gateway. O estado fica no cliente síncrono `sync`, que pode ser
+    compartilhado com workers em threads.
+    """
+
+    def __init__(self, sync: Optional[InMemoryRedis] = None):
+        self.sync = sync or InMemoryRedis()
+
+    def __getattr__(self, name: str):
+        method = getattr(self.sync, name)
+        if name == "brpop":
+            # Bloqueante: roda numa thread para não travar o event loop
+            async def blocking_call(*args, **kwargs):
+                return await asyncio.to_thread(method, *args, **kwargs)
+            return blocking_call
+
+        async def call(*args, **kwargs):
+            return method(*args, **kwargs)
+        return call
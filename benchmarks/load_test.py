@@ -0,0 +1,367 @@
+# Arquivo: benchmarks/load_test.py
+"""
+Gerador de carga para o API Gateway (server/main.py) e a passagem fila -> worker.
+
+Por padrão sobe tudo localmente, sem Docker: o gateway real em um uvicorn
+interno, um Redis em memória (benchmarks/fake_redis.py) e workers falsos que
+consomem a fila com atrasos configuráveis por etapa. As chegadas são de malha
+aberta (processo de Poisson), para que a lentidão do sistema não reduza a carga
+oferecida. Cada cliente simulado envia um PDF e consulta o status até o fim.
+
+Reporta percentis de latência por endpoint, taxas de erro/429, vazão obtida e a
+profundidade da fila ao longo do tempo.
+
+Uso:
+    python -m benchmarks.load_test --rate 20 --duration 30 --workers 4
+    python -m benchmarks.load_test --stages 5:20,20:20,50:20 --stage-delays AnalysisAgent=2.0
+    python -m benchmarks.load_test --target http://localhost:8000 --redis-url redis://localhost:6379/0
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import random
+import socket
+import tempfile
+import threading
+import time
+import uuid
+from typing import Dict, Any, List, Tuple
+
+import httpx
+
+from benchmarks.fake_redis import AsyncInMemoryRedis, InMemoryRedis
+
+TASK_QUEUE_NAME = "task_queue"
+DEFAULT_STAGE_DELAYS = "ExtractionAgent=0.2,MemoryAgent=0.3,AnalysisAgent=1.0,DeliveryAgent=0.01"
+
+
+# --- Worker falso ---
+
+def _emulate_stage_ewma(redis_client: InMemoryRedis, keys: List[str], args: List[Any]) -> int:
+    """Equivalente em Python do STAGE_EWMA_SCRIPT do worker, para o Redis em memória."""
+    alpha = float(args[0])
+    for stage, seconds in zip(args[1::2], args[2::2]):
+        previous = redis_client.hget(keys[0], stage)
+        ewma = seconds if previous is None else alpha * seconds + (1 - alpha) * float(previous)
+        redis_client.hset(keys[0], stage, ewma)
+    return len(args) // 2
+
+
+class FakeWorker(threading.Thread):
+    """Consome a fila como o main.py, mas só dorme o tempo de cada etapa e grava o relatório."""
+
+    def __init__(self, redis_client, output_dir: str, stage_delays: Dict[str, float], jitter: float):
+        super().__init__(daemon=True)
+        self.redis_client = redis_client
+        self.output_dir = output_dir
+        self.stage_delays = stage_delays
+        self.jitter = jitter
+        self.stopped = threading.Event()
+
+    def run(self) -> None:
+        # Mesmas estatísticas que o worker real publica para o controle de admissão
+        from main import STAGE_EWMA_SCRIPT, record_task_stats
+        InMemoryRedis.emulate_script(STAGE_EWMA_SCRIPT, _emulate_stage_ewma)
+
+        while not self.stopped.is_set():
+            item = self.redis_client.brpop(TASK_QUEUE_NAME, timeout=0.2)
+            if not item:
+                continue
+            raw = item[1].decode("utf-8") if isinstance(item[1], bytes) else item[1]
+            payload = json.loads(raw)
+
+            timings = {}
+            for stage, delay in self.stage_delays.items():
+                seconds = max(0.0, delay * random.uniform(1 - self.jitter, 1 + self.jitter))
+                time.sleep(seconds)
+                timings[stage] = seconds
+
+            report = {"task_id": payload["task_id"], "user_query": payload.get("user_request"),
+                      "status": "COMPLETED", "report_content": "Relatório simulado."}
+            with open(os.path.join(self.output_dir, f"{payload['task_id']}.json"), "w") as f:
+                json.dump(report, f)
+            record_task_stats(self.redis_client, payload["task_id"], {"status": "success", "timings": timings})
+
+
+# --- Gateway local ---
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class LocalGateway:
+    """
+    O app FastAPI real em um uvicorn interno, apontado para o Redis substituto.
+    `stop()` encerra o servidor e devolve ao módulo do gateway o cliente Redis e
+    os diretórios originais, para não vazar estado quando roda no mesmo processo.
+    """
+
+    def __init__(self, redis_client, data_dir: str):
+        self.redis_client = redis_client
+        self.input_dir = os.path.join(data_dir, "input_pdfs")
+        self.output_dir = os.path.join(data_dir, "output_reports")
+        self.base_url = None
+        self._server = None
+        self._thread = None
+        self._saved_state = None
+
+    def start(self) -> "LocalGateway":
+        import uvicorn
+        from server import main as gateway
+
+        self._saved_state = (gateway.redis_client, gateway.INPUT_DIR, gateway.OUTPUT_DIR)
+        # Com o cliente já injetado, o lifespan do gateway não abre o pool de conexões
+        gateway.redis_client = AsyncInMemoryRedis(self.redis_client)
+        gateway.INPUT_DIR = self.input_dir
+        gateway.OUTPUT_DIR = self.output_dir
+        os.makedirs(self.input_dir, exist_ok=True)
+        os.makedirs(self.output_dir, exist_ok=True)
+
+        port = _free_port()
+        self._server = uvicorn.Server(uvicorn.Config(gateway.app, host="127.0.0.1", port=port, log_level="warning"))
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+        self._thread.start()
+        while not self._server.started:
+            time.sleep(0.05)
+        self.base_url = f"http://127.0.0.1:{port}"
+        return self
+
+    def stop(self, timeout: float = 5.0) -> None:
+        from server import main as gateway
+
+        if self._server:
+            self._server.should_exit = True
+            self._thread.join(timeout)
+        if self._saved_state:
+            gateway.redis_client, gateway.INPUT_DIR, gateway.OUTPUT_DIR = self._saved_state
+            self._saved_state = None
+
+
+# --- Métricas ---
+
+def percentile(values: List[float], pct: float) -> float | None:
+    if not values:
+        return None
+    ordered = sorted(values)
+    # Método do posto mais próximo (nearest-rank)
+    index = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class Metrics:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {"submit": [], "status": [], "end_to_end": []}
+        self.counts: Dict[str, Dict[str, int]] = {"submit": {}, "status": {}}
+        self.timed_out = 0
+        self.queue_depth: List[Tuple[float, int, int]] = []  # (t, profundidade, clientes em andamento)
+
+    def record(self, kind: str, seconds: float, outcome: str) -> None:
+        self.latencies[kind].append(seconds)
+        self.counts[kind][outcome] = self.counts[kind].get(outcome, 0) + 1
+
+    def summary(self, elapsed: float) -> Dict[str, Any]:
+        result: Dict[str, Any] = {"elapsed_seconds": round(elapsed, 2)}
+        for kind, values in self.latencies.items():
+            counts = self.counts.get(kind, {})
+            total = sum(counts.values()) or len(values)
+            errors = sum(n for outcome, n in counts.items() if outcome not in ("2xx", "429"))
+            result[kind] = {
+                "count": total,
+                "throughput_per_second": round(total / elapsed, 2) if elapsed else None,
+                "error_rate": round(errors / total, 4) if total and counts else None,
+                "rejected_429_rate": round(counts.get("429", 0) / total, 4) if total and counts else None,
+                **{f"p{p}_ms": _ms(percentile(values, p)) for p in (50, 90, 99)},
+                "max_ms": _ms(max(values) if values else None),
+            }
+        result["end_to_end"]["timed_out"] = self.timed_out
+        result["queue_depth"] = [{"t": round(t, 1), "depth": depth, "in_flight": in_flight}
+                                 for t, depth, in_flight in self.queue_depth]
+        return result
+
+
+def _ms(seconds: float | None) -> float | None:
+    return round(seconds * 1000, 1) if seconds is not None else None
+
+
+def _outcome(status_code: int) -> str:
+    if status_code == 429:
+        return "429"
+    return f"{status_code // 100}xx"
+
+
+# --- Clientes simulados ---
+
+async def simulate_client(http: httpx.AsyncClient, metrics: Metrics, args, index: int, in_flight: List[int]) -> None:
+    in_flight[0] += 1
+    try:
+        duplicate = random.random() < args.duplicate_ratio
+        content = b"%PDF-1.4 load-test " + (b"duplicado" if duplicate else uuid.uuid4().bytes)
+        client_id = f"load-client-{index % args.clients}"
+
+        start = time.perf_counter()
+        try:
+            response = await http.post("/api/process-document", data={"query": "Resuma o documento."},
+                                       files={"file": ("carga.pdf", content, "application/pdf")},
+                                       headers={"X-Client-Id": client_id})
+            metrics.record("submit", time.perf_counter() - start, _outcome(response.status_code))
+        except httpx.HTTPError:
+            metrics.record("submit", time.perf_counter() - start, "connection_error")
+            return
+        if response.status_code != 200:
+            return
+
+        task_id = response.json()["task_id"]
+        deadline = start + args.task_timeout
+        while time.perf_counter() < deadline:
+            await asyncio.sleep(args.poll_interval)
+            poll_start = time.perf_counter()
+            try:
+                status = await http.get(f"/api/task-status/{task_id}")
+            except httpx.HTTPError:
+                metrics.record("status", time.perf_counter() - poll_start, "connection_error")
+                continue
+            metrics.record("status", time.perf_counter() - poll_start, _outcome(status.status_code))
+            if status.status_code == 200 and status.json()["status"] in ("SUCCESS", "FAILED"):
+                metrics.latencies["end_to_end"].append(time.perf_counter() - start)
+                return
+        metrics.timed_out += 1
+    finally:
+        in_flight[0] -= 1
+
+
+async def sample_queue_depth(redis_client, metrics: Metrics, interval: float, started: float,
+                             in_flight: List[int], stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        depth = await asyncio.to_thread(redis_client.llen, TASK_QUEUE_NAME) if redis_client else -1
+        metrics.queue_depth.append((time.perf_counter() - started, depth, in_flight[0]))
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=interval)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def run_load(base_url: str, redis_client, stages: List[Tuple[float, float]], args) -> Dict[str, Any]:
+    metrics = Metrics()
+    in_flight = [0]
+    clients: List[asyncio.Task] = []
+    stop_sampling = asyncio.Event()
+    started = time.perf_counter()
+
+    limits = httpx.Limits(max_connections=args.max_connections, max_keepalive_connections=args.max_connections)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.request_timeout) as http:
+        sampler = asyncio.create_task(
+            sample_queue_depth(redis_client, metrics, args.sample_interval, started, in_flight, stop_sampling))
+
+        index = 0
+        for rate, duration in stages:
+            stage_end = time.perf_counter() + duration
+            while True:
+                # Chegadas de Poisson: intervalos exponenciais com média 1/rate
+                await asyncio.sleep(random.expovariate(rate))
+                if time.perf_counter() >= stage_end:
+                    break
+                clients.append(asyncio.create_task(simulate_client(http, metrics, args, index, in_flight)))
+                index += 1
+
+        await asyncio.gather(*clients)
+        stop_sampling.set()
+        await sampler
+
+    summary = metrics.summary(time.perf_counter() - started)
+    summary["offered_requests"] = index
+    return summary
+
+
+# --- CLI ---
+
+def parse_stages(args) -> List[Tuple[float, float]]:
+    if args.stages:
+        return [(float(rate), float(duration)) for rate, duration in
+                (stage.split(":") for stage in args.stages.split(","))]
+    return [(args.rate, args.duration)]
+
+
+def parse_stage_delays(spec: str) -> Dict[str, float]:
+    return {name.strip(): float(delay) for name, delay in (item.split("=") for item in spec.split(",") if item)}
+
+
+def print_report(summary: Dict[str, Any]) -> None:
+    print(f"\nRequisições oferecidas: {summary['offered_requests']} em {summary['elapsed_seconds']}s")
+    header = f"{'endpoint':<12}{'count':>8}{'rps':>9}{'err%':>8}{'429%':>8}{'p50ms':>10}{'p90ms':>10}{'p99ms':>10}{'maxms':>10}"
+    print(header)
+    for kind in ("submit", "status", "end_to_end"):
+        row = summary[kind]
+        fmt = lambda value, pct=False: "-" if value is None else (f"{value * 100:.1f}" if pct else str(value))
+        print(f"{kind:<12}{row['count']:>8}{fmt(row['throughput_per_second']):>9}{fmt(row['error_rate'], True):>8}"
+              f"{fmt(row['rejected_429_rate'], True):>8}{fmt(row['p50_ms']):>10}{fmt(row['p90_ms']):>10}"
+              f"{fmt(row['p99_ms']):>10}{fmt(row['max_ms']):>10}")
+    print(f"Tarefas sem resultado dentro do prazo: {summary['end_to_end']['timed_out']}")
+    print("\nProfundidade da fila (t[s]  fila  clientes em andamento):")
+    for sample in summary["queue_depth"]:
+        print(f"  {sample['t']:>7}  {sample['depth']:>5}  {sample['in_flight']:>6}  {'#' * min(sample['depth'], 60)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga do API Gateway e da fila de tarefas.")
+    parser.add_argument("--target", help="URL de um gateway já em execução (padrão: sobe um gateway local)")
+    parser.add_argument("--redis-url", help="Redis real para medir a fila (com --target)")
+    parser.add_argument("--rate", type=float, default=10.0, help="Chegadas por segundo")
+    parser.add_argument("--duration", type=float, default=30.0, help="Duração em segundos")
+    parser.add_argument("--stages", help="Rampa 'taxa:duração,...', ex.: 5:20,20:20,50:20")
+    parser.add_argument("--workers", type=int, default=2, help="Workers falsos (modo local)")
+    parser.add_argument("--stage-delays", default=DEFAULT_STAGE_DELAYS, help="Atraso por etapa: Agente=segundos,...")
+    parser.add_argument("--jitter", type=float, default=0.2, help="Variação relativa dos atrasos (0-1)")
+    parser.add_argument("--clients", type=int, default=1000, help="Quantidade de X-Client-Id distintos")
+    parser.add_argument("--duplicate-ratio", type=float, default=0.0, help="Fração de envios idênticos")
+    parser.add_argument("--poll-interval", type=float, default=0.5)
+    parser.add_argument("--task-timeout", type=float, default=120.0)
+    parser.add_argument("--request-timeout", type=float, default=30.0)
+    parser.add_argument("--max-connections", type=int, default=500)
+    parser.add_argument("--sample-interval", type=float, default=1.0)
+    parser.add_argument("--json", help="Salva o relatório completo neste arquivo")
+    args = parser.parse_args()
+
+    # Um log por requisição do cliente HTTP distorceria a própria medição
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    stages = parse_stages(args)
+    workers: List[FakeWorker] = []
+    server = None
+
+    if args.target:
+        base_url = args.target
+        redis_client = None
+        if args.redis_url:
+            import redis
+            redis_client = redis.Redis.from_url(args.redis_url, decode_responses=True)
+    else:
+        redis_client = InMemoryRedis()
+        data_dir = tempfile.mkdtemp(prefix="mmas-load-")
+        server = LocalGateway(redis_client, data_dir).start()
+        base_url = server.base_url
+        stage_delays = parse_stage_delays(args.stage_delays)
+        workers = [FakeWorker(redis_client, server.output_dir, stage_delays, args.jitter) for _ in range(args.workers)]
+        for worker in workers:
+            worker.start()
+        print(f"Gateway local em {base_url}, {args.workers} workers falsos, dados em {data_dir}")
+
+    try:
+        summary = asyncio.run(run_load(base_url, redis_client, stages, args))
+    finally:
+        for worker in workers:
+            worker.stopped.set()
+        if server:
+            server.stop()
+
+    print_report(summary)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,17 +4,53 @@ import yaml
 import os
 import time
 import json
+import threading
 import redis
 from dotenv import load_dotenv
 
-# Importa a função principal do Coordenador
-from agents.coordinator_agent import process_task_from_api
+# Importa a função principal do Coordenador (leve: os agentes são importados sob demanda)
+from agents.coordinator_agent import process_task_from_api, preload_agents, get_warm_agents
 
 # --- CONFIGURAÇÃO ---
 REDIS_HOST = os.getenv("REDIS_HOST", "message-broker")
 REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
 TASK_QUEUE_NAME = "task_queue"
 
+# Arquivo de prontidão (readiness probe) lido pelo orquestrador/healthcheck. Fica
+# fora de data/ (volume compartilhado por todas as réplicas): cada container tem o seu.
+READINESS_FILE = os.getenv("READINESS_FILE", "/tmp/worker_ready.json")
+# Agentes pré-carregados em background: "all", "none" ou lista separada por vírgulas
+PRELOAD_AGENTS = os.getenv("PRELOAD_AGENTS", "all")
+
+# Estatísticas de vazão publicadas para o controle de admissão do API Gateway
+STATS_STAGE_KEY = "stats:stage_seconds"      # hash: agente -> média móvel (EWMA) da duração
+STATS_COMPLETIONS_KEY = "stats:completions"  # sorted set: conclusões recentes (score = timestamp)
+THROUGHPUT_WINDOW_SECONDS = int(os.getenv("THROUGHPUT_WINDOW_SECONDS", 300))
+STAGE_EWMA_ALPHA = 0.2
+# Atualiza as médias móveis de uma vez no servidor: vários workers publicam ao
+# mesmo tempo e um HGET/HSET feito pelo cliente perderia atualizações.
+# KEYS[1] = hash de estatísticas; ARGV = alpha, etapa1, segundos1, etapa2, segundos2...
+STAGE_EWMA_SCRIPT = """
+local alpha = tonumber(ARGV[1])
+for i = 2, #ARGV, 2 do
+    local seconds = tonumber(ARGV[i + 1])
+    local previous = redis.call('HGET', KEYS[1], ARGV[i])
+    if previous then
+        seconds = alpha * seconds + (1 - alpha) * tonumber(previous)
+    end
+    redis.call('HSET', KEYS[1], ARGV[i], tostring(seconds))
+end
+return (#ARGV - 1) / 2
+"""
+
+# Falhas ficam visíveis ao API Gateway (status FAILED + endpoint de retry)
+TASK_ERROR_KEY_PREFIX = "task_error:"
+# Sinal de cancelamento gravado pelo API Gateway (DELETE /api/task/{task_id})
+TASK_CANCELLED_KEY_PREFIX = "task_cancelled:"
+TASK_ERROR_TTL_SECONDS = int(os.getenv("TASK_ERROR_TTL_SECONDS", 86400))
+
+_readiness_lock = threading.Lock()
+
 # 1. Função de Inicialização de Logs
 def initialize_logging(config_path='logging_config.yaml'):
     """Carrega a configuração de logging e garante o diretório de logs."""
@@ -32,13 +68,76 @@ def initialize_logging(config_path='logging_config.yaml'):
     except Exception as e:
         print(f"ERRO CRÍTICO: Falha ao carregar logging config: {e}")
 
-# 2. Inicialização do Motor do Backend
+# 2. Sinal de Prontidão
+def write_readiness(status: str):
+    """Grava atomicamente o estado do worker e quais agentes já estão aquecidos."""
+    state = {
+        "status": status,
+        "warm_agents": get_warm_agents(),
+        "pid": os.getpid(),
+        "updated_at": time.time(),
+    }
+    with _readiness_lock:
+        try:
+            os.makedirs(os.path.dirname(READINESS_FILE) or '.', exist_ok=True)
+            tmp_path = f"{READINESS_FILE}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(state, f)
+            os.replace(tmp_path, READINESS_FILE)
+        except OSError as e:
+            logging.getLogger().warning("Falha ao gravar o arquivo de prontidão: %s", e)
+
+def start_background_preload():
+    """Aquece os agentes em uma thread daemon, sem atrasar o consumo da fila."""
+    if PRELOAD_AGENTS.lower() == "none":
+        return None
+    agent_names = None if PRELOAD_AGENTS.lower() == "all" else \
+        [name.strip() for name in PRELOAD_AGENTS.split(",") if name.strip()]
+
+    def _run():
+        preload_agents(agent_names)
+        write_readiness("ready")
+
+    thread = threading.Thread(target=_run, name="agent-preload", daemon=True)
+    thread.start()
+    return thread
+
+def record_task_stats(redis_client, task_id: str, result: dict | None):
+    """
+    Publica no Redis a duração de cada etapa e o instante de conclusão da tarefa.
+    Só tarefas concluídas com sucesso contam: falhas, prazos esgotados e
+    cancelamentos inflariam a vazão usada pelo controle de admissão.
+    """
+    if not result or result.get("status") != "success":
+        return
+    now = time.time()
+    try:
+        timings = result.get("timings") or {}
+        if timings:
+            args = [STAGE_EWMA_ALPHA]
+            for stage, seconds in timings.items():
+                args.extend([stage, seconds])
+            redis_client.register_script(STAGE_EWMA_SCRIPT)(keys=[STATS_STAGE_KEY], args=args)
+        redis_client.zadd(STATS_COMPLETIONS_KEY, {f"{task_id}:{now}": now})
+        redis_client.zremrangebyscore(STATS_COMPLETIONS_KEY, 0, now - THROUGHPUT_WINDOW_SECONDS)
+    except redis.exceptions.RedisError as e:
+        logging.getLogger().warning("Falha ao publicar estatísticas da tarefa %s: %s", task_id, e)
+
+def record_task_failure(redis_client, task_id: str, message: str):
+    """Registra a falha para que o cliente veja FAILED e possa pedir um retry."""
+    try:
+        redis_client.set(f"{TASK_ERROR_KEY_PREFIX}{task_id}", message, ex=TASK_ERROR_TTL_SECONDS)
+    except redis.exceptions.RedisError as e:
+        logging.getLogger().warning("Falha ao registrar o erro da tarefa %s: %s", task_id, e)
+
+# 3. Inicialização do Motor do Backend
 def start_agent_backend():
     load_dotenv()
     initialize_logging()
     
     root_logger = logging.getLogger()
     root_logger.info("Sistema de Multiagentes Inicializado.")
+    write_readiness("starting")
 
     # Conexão com Redis
     try:
@@ -47,8 +146,13 @@ def start_agent_backend():
         root_logger.info(f"Conectado ao Redis em {REDIS_HOST}:{REDIS_PORT}")
     except redis.exceptions.ConnectionError as e:
         root_logger.error(f"Não foi possível conectar ao Redis. O sistema será encerrado: {e}", exc_info=True)
+        write_readiness("unavailable")
         return
 
+    # O worker já aceita tarefas; as dependências pesadas são carregadas em paralelo
+    write_readiness("ready")
+    start_background_preload()
+
     print(f"\n--- Modo de Escuta Ativado na fila '{TASK_QUEUE_NAME}' (Ctrl+C para sair) ---")
     
     try:
@@ -67,18 +171,38 @@ def start_agent_backend():
             task_id = payload.get("task_id", "ID não encontrado")
             root_logger.info(f"Nova tarefa recebida da fila: {task_id}")
 
+            # Tarefas canceladas ou com prazo vencido enquanto estavam na fila são descartadas
+            cancel_key = f"{TASK_CANCELLED_KEY_PREFIX}{task_id}"
+            if redis_client.exists(cancel_key):
+                root_logger.info("Tarefa %s cancelada antes do início; descartada.", task_id)
+                continue
+            deadline = payload.get("deadline")
+            if deadline is not None and deadline <= time.time():
+                root_logger.warning("Tarefa %s expirou na fila; descartada.", task_id)
+                record_task_failure(redis_client, task_id, "Prazo da tarefa esgotado antes do início.")
+                continue
+
+            result = None
             try:
-                # Executa o processo multiagentes
-                result = process_task_from_api(payload)
+                # Executa o processo multiagentes (o cancelamento é consultado entre as etapas)
+                result = process_task_from_api(payload, is_cancelled=lambda: bool(redis_client.exists(cancel_key)))
                 
                 # Reporta o resultado
                 root_logger.info("Resultado da Tarefa %s: Status: %s", 
-                                 task_id, result.get('status', 'desconhecido'))
+                                 task_id, result.get('status', 'desconhecido') if result else 'desconhecido')
+                if not result or result.get('status') not in ('success', 'cancelled'):
+                    record_task_failure(redis_client, task_id,
+                                        result.get('message', 'Erro desconhecido.') if result else 'Workflow não executado.')
 
             except Exception as e:
                 root_logger.error("Erro ao processar a tarefa %s: %s", task_id, e, exc_info=True)
+                record_task_failure(redis_client, task_id, str(e))
                 # Opcional: mover para uma fila de "falhas" em vez de descartar
                 # redis_client.lpush("failed_queue", task_payload_str)
+            finally:
+                record_task_stats(redis_client, task_id, result)
+                # Agentes carregados sob demanda passam a constar como aquecidos
+                write_readiness("ready")
 
 
     except KeyboardInterrupt:
@@ -86,6 +210,7 @@ def start_agent_backend():
     except Exception as e:
         root_logger.error("Erro fatal no loop principal: %s", str(e), exc_info=True)
     finally:
+        write_readiness("stopped")
         root_logger.info("Shutdown completo.")
 
 
@@ -1,19 +1,67 @@
 # Arquivo: server/main.py
+import asyncio
 import os
+import re
+import time
 import uuid
 import json
+import hashlib
 import logging
 import redis
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException
+from redis import asyncio as aioredis
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
-from typing import Optional
+from typing import Optional, Tuple
 
 # --- Configuração ---
 REDIS_HOST = os.getenv("REDIS_HOST", "message-broker")
 REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
 TASK_QUEUE_NAME = "task_queue"
 
+# Pool de conexões assíncronas, criado no lifespan da aplicação. Com o pool
+# cheio as requisições esperam até REDIS_POOL_TIMEOUT segundos por uma conexão
+# livre em vez de abrir conexões sem limite.
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", 50))
+REDIS_POOL_TIMEOUT = float(os.getenv("REDIS_POOL_TIMEOUT", 5))
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", 5))
+REDIS_HEALTH_CHECK_INTERVAL = float(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", 15))
+# Ao reconectar, o pool antigo só é fechado depois deste prazo, para não derrubar
+# as requisições que ainda o estão usando
+REDIS_POOL_DRAIN_SECONDS = float(os.getenv("REDIS_POOL_DRAIN_SECONDS", 30))
+
+# Coalescência (single-flight): submissões idênticas (mesmo PDF, mesma pergunta,
+# mesmo workflow) são anexadas à tarefa já enfileirada/em execução.
+INFLIGHT_KEY_PREFIX = "inflight:"     # inflight:{fingerprint} -> task_id
+TASK_META_KEY_PREFIX = "task_meta:"   # task_meta:{task_id} -> {fingerprint, refs, deadline_seconds, caller:{id}, anonymous_refs}
+CALLER_FIELD_PREFIX = "caller:"       # um campo por cliente (X-Client-Id) interessado
+ANONYMOUS_REFS_FIELD = "anonymous_refs"  # submissões sem X-Client-Id: uma referência por submissão
+COALESCE_TTL_SECONDS = int(os.getenv("COALESCE_TTL_SECONDS", 3600))
+
+# Controle de admissão (backpressure). Um limite igual a 0 desativa a verificação.
+MAX_QUEUE_DEPTH = int(os.getenv("MAX_QUEUE_DEPTH", 100))
+MAX_QUEUE_WAIT_SECONDS = int(os.getenv("MAX_QUEUE_WAIT_SECONDS", 900))
+RATE_LIMIT_PER_MINUTE = int(os.getenv("RATE_LIMIT_PER_MINUTE", 30))
+RATE_LIMIT_KEY_PREFIX = "ratelimit:"
+
+# Retentativas: o payload original fica guardado para que a tarefa possa ser
+# reenfileirada; o worker retoma do primeiro passo sem checkpoint.
+TASK_PAYLOAD_KEY_PREFIX = "task_payload:"
+TASK_PAYLOAD_TTL_SECONDS = int(os.getenv("TASK_PAYLOAD_TTL_SECONDS", 86400))
+TASK_ERROR_KEY_PREFIX = "task_error:"   # gravado pelo worker quando a tarefa falha
+
+# Prazos e cancelamento: cada tarefa leva um prazo absoluto (epoch) no payload,
+# verificado pelo worker; DELETE /api/task/{task_id} sinaliza o cancelamento.
+TASK_DEADLINE_SECONDS = float(os.getenv("TASK_DEADLINE_SECONDS", 900))
+TASK_CANCELLED_KEY_PREFIX = "task_cancelled:"
+
+# Estatísticas publicadas pelo worker (ver main.py na raiz do projeto)
+STATS_STAGE_KEY = "stats:stage_seconds"
+STATS_COMPLETIONS_KEY = "stats:completions"
+THROUGHPUT_WINDOW_SECONDS = int(os.getenv("THROUGHPUT_WINDOW_SECONDS", 300))
+
 # Diretórios compartilhados via volume do Docker
 INPUT_DIR = "/app/data/input_pdfs"
 OUTPUT_DIR = "/app/data/output_reports"
@@ -27,13 +75,83 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("api-gateway")
 
 # --- Conexão com Redis ---
-try:
-    redis_client = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, db=0, decode_responses=True)
-    redis_client.ping()
-    logger.info(f"Conectado ao Redis em {REDIS_HOST}:{REDIS_PORT}")
-except redis.exceptions.ConnectionError as e:
-    logger.error(f"Não foi possível conectar ao Redis: {e}", exc_info=True)
-    redis_client = None
+# Preenchido pelo lifespan (ou injetado antes da inicialização, como fazem os
+# testes e o benchmarks/load_test.py). None enquanto o Redis estiver inacessível.
+redis_client: Optional[aioredis.Redis] = None
+
+def create_redis_client() -> aioredis.Redis:
+    pool = aioredis.BlockingConnectionPool(
+        host=REDIS_HOST,
+        port=REDIS_PORT,
+        db=0,
+        decode_responses=True,
+        max_connections=REDIS_MAX_CONNECTIONS,
+        timeout=REDIS_POOL_TIMEOUT,
+        socket_connect_timeout=REDIS_SOCKET_TIMEOUT,
+        socket_timeout=REDIS_SOCKET_TIMEOUT,
+        health_check_interval=REDIS_HEALTH_CHECK_INTERVAL,
+    )
+    return aioredis.Redis(connection_pool=pool)
+
+async def close_redis_client(client: Optional[aioredis.Redis]) -> None:
+    if client is None:
+        return
+    try:
+        await client.connection_pool.disconnect()
+    except redis.exceptions.RedisError:
+        pass
+
+_retiring_clients = set()
+
+def retire_redis_client(client: Optional[aioredis.Redis]) -> None:
+    """Agenda o fechamento do pool substituído após REDIS_POOL_DRAIN_SECONDS."""
+    if client is None:
+        return
+
+    async def _close_later():
+        await asyncio.sleep(REDIS_POOL_DRAIN_SECONDS)
+        await close_redis_client(client)
+
+    task = asyncio.create_task(_close_later())
+    _retiring_clients.add(task)
+    task.add_done_callback(_retiring_clients.discard)
+
+async def connect_redis() -> bool:
+    """(Re)cria o pool e valida a conexão; em caso de falha mantém redis_client = None."""
+    global redis_client
+    client = create_redis_client()
+    try:
+        await client.ping()
+    except redis.exceptions.RedisError as e:
+        logger.error(f"Não foi possível conectar ao Redis: {e}")
+        await close_redis_client(client)
+        previous, redis_client = redis_client, None
+        retire_redis_client(previous)
+        return False
+    # Troca primeiro; o pool antigo é fechado depois que as requisições em curso o liberarem
+    previous, redis_client = redis_client, client
+    retire_redis_client(previous)
+    logger.info(f"Conectado ao Redis em {REDIS_HOST}:{REDIS_PORT} (pool de até {REDIS_MAX_CONNECTIONS} conexões).")
+    return True
+
+async def check_redis_health() -> bool:
+    """PING no Redis; se falhar (ou não houver conexão), tenta reconectar."""
+    if redis_client is not None:
+        try:
+            await redis_client.ping()
+            return True
+        except redis.exceptions.RedisError as e:
+            logger.warning(f"Health check do Redis falhou: {e}. Reconectando.")
+    return await connect_redis()
+
+async def monitor_redis_health(interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await check_redis_health()
+        except Exception as e:
+            # Nenhuma falha inesperada pode encerrar o monitor silenciosamente
+            logger.error(f"Erro inesperado no health check do Redis: {e}", exc_info=True)
 
 # --- Modelo de Dados ---
 class TaskStatus(BaseModel):
@@ -41,11 +159,243 @@ class TaskStatus(BaseModel):
     status: str
     result: Optional[str] = None
     error: Optional[str] = None
+    coalesced: bool = False
+    estimated_completion_seconds: Optional[float] = None
+
+# --- Coalescência de Requisições ---
+def compute_fingerprint(content: bytes, query: str, workflow: str) -> str:
+    """Identifica o trabalho: hash do conteúdo do PDF + pergunta normalizada + workflow."""
+    normalized_query = re.sub(r"\s+", " ", query).strip().lower()
+    digest = hashlib.sha256()
+    digest.update(hashlib.sha256(content).digest())
+    digest.update(b"\0" + normalized_query.encode("utf-8"))
+    digest.update(b"\0" + workflow.encode("utf-8"))
+    return digest.hexdigest()
+
+def get_client_id(request: Request) -> str:
+    """Identifica o cliente pelo cabeçalho X-Client-Id ou, na falta dele, pelo IP (rate limit)."""
+    return request.headers.get("X-Client-Id") or (request.client.host if request.client else "anon")
+
+def get_caller_id(request: Request) -> Optional[str]:
+    """
+    Identidade usada na coalescência: só o X-Client-Id. O IP não serve, pois
+    clientes atrás do mesmo NAT seriam fundidos em um só interessado.
+    """
+    return request.headers.get("X-Client-Id") or None
+
+def caller_fields(caller_id: Optional[str]) -> dict:
+    """Campos de task_meta que registram o primeiro interessado de uma tarefa."""
+    return {ANONYMOUS_REFS_FIELD: 1} if caller_id is None else {CALLER_FIELD_PREFIX + caller_id: 1}
+
+async def add_caller(meta_key: str, caller_id: Optional[str]) -> None:
+    """
+    Registra mais um interessado. Reenvios do mesmo X-Client-Id não contam de
+    novo; sem o cabeçalho cada submissão conta como um interessado.
+    """
+    if caller_id is None:
+        await redis_client.hincrby(meta_key, ANONYMOUS_REFS_FIELD, 1)
+        await redis_client.hincrby(meta_key, "refs", 1)
+    elif await redis_client.hset(meta_key, CALLER_FIELD_PREFIX + caller_id, 1):
+        await redis_client.hincrby(meta_key, "refs", 1)
+
+async def drop_caller(task_id: str, caller_id: Optional[str]) -> Tuple[bool, Optional[int]]:
+    """
+    Remove o interessado. Retorna (removido, quantos restam); restam None se a
+    tarefa não é rastreada. Sem X-Client-Id é removida uma referência anônima.
+    """
+    meta_key = TASK_META_KEY_PREFIX + task_id
+    if not await redis_client.exists(meta_key):
+        return False, None
+    if caller_id is None:
+        dropped = await redis_client.hincrby(meta_key, ANONYMOUS_REFS_FIELD, -1) >= 0
+        if not dropped:
+            await redis_client.hincrby(meta_key, ANONYMOUS_REFS_FIELD, 1)
+    else:
+        dropped = bool(await redis_client.hdel(meta_key, CALLER_FIELD_PREFIX + caller_id))
+    if dropped:
+        return True, await redis_client.hincrby(meta_key, "refs", -1)
+    return False, int(await redis_client.hget(meta_key, "refs") or 0)
+
+async def attach_to_inflight_task(fingerprint: str, caller_id: Optional[str],
+                                  deadline_seconds: float) -> Optional[str]:
+    """Retorna o task_id em andamento para o fingerprint, registrando o cliente como interessado."""
+    task_id = await redis_client.get(INFLIGHT_KEY_PREFIX + fingerprint)
+    if not task_id:
+        return None
+    meta_key = TASK_META_KEY_PREFIX + task_id
+    # Sem metadados a tarefa já foi entregue/expirou: não há a que se anexar
+    if not await redis_client.exists(meta_key):
+        return None
+    # Tarefa que falhou (inclusive por prazo) ou foi cancelada: libera o
+    # fingerprint para que a nova submissão gere outra tarefa
+    if await redis_client.exists(TASK_ERROR_KEY_PREFIX + task_id, TASK_CANCELLED_KEY_PREFIX + task_id):
+        await forget_inflight_task(task_id)
+        return None
+    # Quem pede um prazo maior que o da tarefa existente não deve herdar o mais curto
+    task_deadline_seconds = await redis_client.hget(meta_key, "deadline_seconds")
+    if task_deadline_seconds is not None and float(task_deadline_seconds) < deadline_seconds:
+        return None
+    await add_caller(meta_key, caller_id)
+    return task_id
+
+async def register_inflight_task(fingerprint: str, task_id: str, caller_id: Optional[str],
+                                 deadline_seconds: float) -> Optional[str]:
+    """
+    Registra a nova tarefa como dona do fingerprint. Se outra requisição
+    idêntica venceu a corrida, retorna o task_id dela em vez de registrar.
+    """
+    meta_key = TASK_META_KEY_PREFIX + task_id
+    await redis_client.hset(meta_key, mapping={"fingerprint": fingerprint, "refs": 1,
+                                              "deadline_seconds": deadline_seconds,
+                                              **caller_fields(caller_id)})
+    await redis_client.expire(meta_key, COALESCE_TTL_SECONDS)
+    if await redis_client.set(INFLIGHT_KEY_PREFIX + fingerprint, task_id, nx=True, ex=COALESCE_TTL_SECONDS):
+        return None
+    await redis_client.delete(meta_key)
+    winner = await attach_to_inflight_task(fingerprint, caller_id, deadline_seconds)
+    if winner:
+        return winner
+    # O registro existente estava obsoleto (ou tem prazo mais curto): assume o fingerprint
+    await redis_client.hset(meta_key, mapping={"fingerprint": fingerprint, "refs": 1,
+                                              "deadline_seconds": deadline_seconds,
+                                              **caller_fields(caller_id)})
+    await redis_client.expire(meta_key, COALESCE_TTL_SECONDS)
+    await redis_client.set(INFLIGHT_KEY_PREFIX + fingerprint, task_id, ex=COALESCE_TTL_SECONDS)
+    return None
+
+async def release_task_result(task_id: str, caller_id: Optional[str]) -> bool:
+    """
+    Marca que o interessado recebeu o resultado. Retorna True quando era o
+    último (o arquivo de resultado pode então ser removido).
+    """
+    if not redis_client:
+        return True
+    _, remaining = await drop_caller(task_id, caller_id)
+    if remaining is None:
+        return True
+    if remaining > 0:
+        return False
+    await forget_inflight_task(task_id)
+    return True
+
+async def forget_inflight_task(task_id: str) -> None:
+    """Desfaz o registro de coalescência: novas submissões idênticas geram outra tarefa."""
+    meta_key = TASK_META_KEY_PREFIX + task_id
+    fingerprint = await redis_client.hget(meta_key, "fingerprint")
+    if fingerprint and await redis_client.get(INFLIGHT_KEY_PREFIX + fingerprint) == task_id:
+        await redis_client.delete(INFLIGHT_KEY_PREFIX + fingerprint)
+    await redis_client.delete(meta_key)
+
+# --- Controle de Admissão ---
+async def get_service_seconds() -> Optional[float]:
+    """Tempo médio de uma tarefa: soma das médias móveis de cada etapa."""
+    stages = await redis_client.hgetall(STATS_STAGE_KEY)
+    return sum(float(seconds) for seconds in stages.values()) if stages else None
+
+async def get_throughput(service_seconds: Optional[float]) -> Optional[float]:
+    """Vazão (tarefas/s) observada na janela recente."""
+    now = time.time()
+    completed = await redis_client.zcount(STATS_COMPLETIONS_KEY, now - THROUGHPUT_WINDOW_SECONDS, now)
+    observed = completed / THROUGHPUT_WINDOW_SECONDS
+    # Com a fila ociosa a vazão observada subestima a capacidade: assume ao menos um worker
+    single_worker = 1 / service_seconds if service_seconds else 0.0
+    return max(observed, single_worker) or None
+
+async def enforce_rate_limit(client_id: str) -> None:
+    """Janela fixa de um minuto por cliente; excedida, responde 429."""
+    if RATE_LIMIT_PER_MINUTE <= 0:
+        return
+    now = time.time()
+    key = f"{RATE_LIMIT_KEY_PREFIX}{client_id}:{int(now // 60)}"
+    count = await redis_client.incr(key)
+    if count == 1:
+        await redis_client.expire(key, 60)
+    if count > RATE_LIMIT_PER_MINUTE:
+        raise HTTPException(
+            status_code=429,
+            detail="Limite de requisições por minuto excedido para este cliente.",
+            headers={"Retry-After": str(max(1, 60 - int(now) % 60))},
+        )
+
+async def check_admission() -> Optional[float]:
+    """
+    Recusa (429 + Retry-After) quando a fila está cheia ou a espera estimada
+    passa do limite. Retorna a estimativa de conclusão em segundos, se houver.
+    """
+    queue_depth, service_seconds = await asyncio.gather(
+        redis_client.llen(TASK_QUEUE_NAME), get_service_seconds())
+    throughput = await get_throughput(service_seconds)
+    wait_seconds = queue_depth / throughput + (service_seconds or 0.0) if throughput else None
+
+    retry_after = None
+    if MAX_QUEUE_DEPTH > 0 and queue_depth >= MAX_QUEUE_DEPTH:
+        # Tempo para a fila drenar o excedente
+        excess = queue_depth - MAX_QUEUE_DEPTH + 1
+        retry_after = excess / throughput if throughput else 30
+    elif MAX_QUEUE_WAIT_SECONDS > 0 and wait_seconds is not None and wait_seconds > MAX_QUEUE_WAIT_SECONDS:
+        retry_after = wait_seconds - MAX_QUEUE_WAIT_SECONDS
+
+    if retry_after is not None:
+        logger.warning(f"Admissão recusada: fila com {queue_depth} tarefas, espera estimada {wait_seconds}s.")
+        raise HTTPException(
+            status_code=429,
+            detail="Sistema sobrecarregado. Tente novamente mais tarde.",
+            headers={"Retry-After": str(max(1, int(retry_after + 0.5)))},
+        )
+    return wait_seconds
+
+async def get_remaining_seconds(task_id: str) -> Optional[float]:
+    """Tempo restante previsto para a tarefa, a partir do ETA gravado na admissão."""
+    if not redis_client:
+        return None
+    eta = await redis_client.hget(TASK_META_KEY_PREFIX + task_id, "eta")
+    if eta is None:
+        return None
+    return round(max(float(eta) - time.time(), 0.0), 1)
+
+# --- E/S de Arquivos (executada fora do event loop) ---
+def write_file(path: str, content: bytes) -> None:
+    with open(path, "wb") as buffer:
+        buffer.write(content)
+
+def read_report(path: str) -> Optional[dict]:
+    """Lê o relatório gerado pelo worker; None se ainda não existe."""
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def remove_file(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
 
 # --- Inicialização da Aplicação ---
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Um cliente injetado antes da inicialização (testes, teste de carga) é usado como está
+    owns_client = redis_client is None
+    monitor = None
+    if owns_client:
+        await connect_redis()
+        if REDIS_HEALTH_CHECK_INTERVAL > 0:
+            monitor = asyncio.create_task(monitor_redis_health(REDIS_HEALTH_CHECK_INTERVAL))
+    try:
+        yield
+    finally:
+        if monitor:
+            monitor.cancel()
+        for task in list(_retiring_clients):
+            task.cancel()
+        if owns_client:
+            await close_redis_client(redis_client)
+
 app = FastAPI(
     title="API Gateway para Sistema de Multiagentes",
     description="Recebe requisições de análise de documentos e as enfileira para o backend de agentes via Redis.",
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -56,16 +406,27 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.exception_handler(redis.exceptions.RedisError)
+async def redis_error_handler(request: Request, exc: redis.exceptions.RedisError):
+    """Falhas do Redis durante uma requisição viram 503, como quando ele está fora do ar."""
+    logger.error(f"Erro de Redis em {request.method} {request.url.path}: {exc}")
+    return JSONResponse(status_code=503, content={"detail": "Serviço de fila indisponível (Redis)."})
+
 # --- Endpoints da API ---
 
 @app.get("/", summary="Verificação de Saúde")
 async def read_root():
+    if not await check_redis_health():
+        raise HTTPException(status_code=503, detail="Serviço de fila indisponível (Redis).")
     return {"message": "API Gateway está operacional."}
 
 @app.post("/api/process-document", response_model=TaskStatus, summary="Processar um novo documento")
 async def process_document(
+    request: Request,
     query: str = Form(...),
-    file: UploadFile = File(...)
+    file: UploadFile = File(...),
+    deadline_seconds: Optional[float] = Form(None, gt=0),
+    profile: Optional[bool] = Form(None)
 ):
     if not redis_client:
         raise HTTPException(status_code=503, detail="Serviço de fila indisponível (Redis).")
@@ -73,13 +434,32 @@ async def process_document(
     if not file.filename.lower().endswith(".pdf"):
         raise HTTPException(status_code=400, detail="Somente arquivos PDF são permitidos.")
 
+    await enforce_rate_limit(get_client_id(request))
+    caller_id = get_caller_id(request)
+
     task_id = str(uuid.uuid4())
     saved_file_path = os.path.join(INPUT_DIR, f"{task_id}_{file.filename}")
+    workflow_hint = "default_pdf_analysis"
+    if deadline_seconds is None:
+        deadline_seconds = TASK_DEADLINE_SECONDS
 
     try:
+        content = await file.read()
+
+        # Requisição duplicada? Anexa à tarefa existente sem reenfileirar
+        fingerprint = compute_fingerprint(content, query, workflow_hint)
+        existing_task_id = await attach_to_inflight_task(fingerprint, caller_id, deadline_seconds)
+        if not existing_task_id:
+            # Só trabalho novo passa pelo controle de admissão
+            wait_seconds = await check_admission()
+            existing_task_id = await register_inflight_task(fingerprint, task_id, caller_id, deadline_seconds)
+        if existing_task_id:
+            logger.info(f"Requisição duplicada anexada à tarefa {existing_task_id} (fingerprint {fingerprint[:12]}).")
+            return TaskStatus(task_id=existing_task_id, status="PENDING", coalesced=True,
+                              estimated_completion_seconds=await get_remaining_seconds(existing_task_id))
+
         # Salva o arquivo PDF
-        with open(saved_file_path, "wb") as buffer:
-            buffer.write(await file.read())
+        await asyncio.to_thread(write_file, saved_file_path, content)
         logger.info(f"Arquivo '{file.filename}' salvo em '{saved_file_path}' para a tarefa {task_id}.")
 
         # Cria a tarefa e a publica na fila do Redis
@@ -87,45 +467,142 @@ async def process_document(
             "task_id": task_id,
             "user_request": query,
             "file_path": saved_file_path,
-            "workflow_hint": "default_pdf_analysis"
+            "workflow_hint": workflow_hint,
+            "deadline_seconds": deadline_seconds,
+            "deadline": time.time() + deadline_seconds
         }
+        # Profiling por tarefa (ver tools/profiler.py); sem o campo vale o PROFILE_TASKS do worker
+        if profile is not None:
+            task_payload["profile"] = profile
         
-        redis_client.lpush(TASK_QUEUE_NAME, json.dumps(task_payload))
+        raw_payload = json.dumps(task_payload)
+        await redis_client.set(TASK_PAYLOAD_KEY_PREFIX + task_id, raw_payload, ex=TASK_PAYLOAD_TTL_SECONDS)
+        await redis_client.lpush(TASK_QUEUE_NAME, raw_payload)
+        if wait_seconds is not None:
+            await redis_client.hset(TASK_META_KEY_PREFIX + task_id, mapping={"eta": time.time() + wait_seconds})
         logger.info(f"Tarefa {task_id} adicionada à fila '{TASK_QUEUE_NAME}'.")
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Erro ao processar o upload para a tarefa {task_id}: {e}", exc_info=True)
+        # Libera o fingerprint para que uma nova tentativa não se anexe a uma tarefa que nunca foi enfileirada
+        try:
+            await release_task_result(task_id, caller_id)
+        except redis.exceptions.RedisError:
+            pass
+        if isinstance(e, redis.exceptions.RedisError):
+            raise HTTPException(status_code=503, detail="Serviço de fila indisponível (Redis).")
         raise HTTPException(status_code=500, detail=f"Erro interno do servidor: {e}")
 
-    return TaskStatus(task_id=task_id, status="PENDING")
+    return TaskStatus(task_id=task_id, status="PENDING",
+                      estimated_completion_seconds=round(wait_seconds, 1) if wait_seconds is not None else None)
 
 
 @app.get("/api/task-status/{task_id}", response_model=TaskStatus, summary="Verificar o status de uma tarefa")
-async def get_task_status(task_id: str):
+async def get_task_status(task_id: str, request: Request):
     """
     Verifica o resultado de uma tarefa.
     Se um resultado existe, retorna SUCESSO. Senão, assume que está em processamento ou pendente.
     """
     output_file_path = os.path.join(OUTPUT_DIR, f"{task_id}.json")
 
-    if os.path.exists(output_file_path):
-        try:
-            with open(output_file_path, "r") as f:
-                result_data = json.load(f)
-            
-            os.remove(output_file_path)
-
-            return TaskStatus(
-                task_id=task_id,
-                status="SUCCESS",
-                result=result_data.get("report_content", "Conteúdo não encontrado.")
-            )
-        except Exception as e:
-            logger.error(f"Erro ao ler o arquivo de resultado para a tarefa {task_id}: {e}", exc_info=True)
-            return TaskStatus(task_id=task_id, status="FAILED", error=str(e))
-    else:
-        # Se o arquivo de saída não existe, a tarefa está na fila ou sendo processada.
-        # Uma lógica mais granular poderia consultar um status no Redis, 
-        # mas isso exigiria que o worker atualizasse o status,
-        # o que foge do escopo desta refatoração inicial.
-        return TaskStatus(task_id=task_id, status="PROCESSING")
\ No newline at end of file
+    # Erros do Redis daqui em diante viram 503 (ver redis_error_handler)
+    try:
+        result_data = await asyncio.to_thread(read_report, output_file_path)
+    except (OSError, ValueError) as e:
+        logger.error(f"Erro ao ler o arquivo de resultado para a tarefa {task_id}: {e}", exc_info=True)
+        return TaskStatus(task_id=task_id, status="FAILED", error=str(e))
+
+    if result_data is not None:
+        # Só remove quando todos os clientes anexados à tarefa receberam o resultado
+        if await release_task_result(task_id, get_caller_id(request)):
+            await asyncio.to_thread(remove_file, output_file_path)
+
+        return TaskStatus(
+            task_id=task_id,
+            status="SUCCESS",
+            result=result_data.get("report_content", "Conteúdo não encontrado.")
+        )
+
+    if redis_client and await redis_client.exists(TASK_CANCELLED_KEY_PREFIX + task_id):
+        return TaskStatus(task_id=task_id, status="CANCELLED")
+    # O worker registra as falhas no Redis; sem registro, a tarefa está na fila ou sendo processada.
+    error = await redis_client.get(TASK_ERROR_KEY_PREFIX + task_id) if redis_client else None
+    if error:
+        return TaskStatus(task_id=task_id, status="FAILED", error=error)
+    return TaskStatus(task_id=task_id, status="PROCESSING",
+                      estimated_completion_seconds=await get_remaining_seconds(task_id))
+
+
+@app.post("/api/task/{task_id}/retry", response_model=TaskStatus, summary="Reprocessar uma tarefa que falhou")
+async def retry_task(task_id: str, force: bool = False):
+    """
+    Reenfileira a tarefa com o payload original. O worker pula os passos que já
+    têm checkpoint (extração do PDF, embeddings) e retoma do primeiro incompleto.
+    Por padrão só tarefas com status FAILED são aceitas; `force=true` permite
+    reenfileirar uma tarefa presa (ex.: worker reiniciado no meio da execução).
+    """
+    if not redis_client:
+        raise HTTPException(status_code=503, detail="Serviço de fila indisponível (Redis).")
+
+    if await asyncio.to_thread(os.path.exists, os.path.join(OUTPUT_DIR, f"{task_id}.json")):
+        raise HTTPException(status_code=409, detail="A tarefa já foi concluída.")
+
+    raw_payload = await redis_client.get(TASK_PAYLOAD_KEY_PREFIX + task_id)
+    if not raw_payload:
+        raise HTTPException(status_code=404, detail="Tarefa não encontrada ou expirada.")
+
+    if not force and not await redis_client.exists(TASK_ERROR_KEY_PREFIX + task_id):
+        raise HTTPException(status_code=409, detail="A tarefa não falhou (ainda na fila, em execução ou cancelada).")
+
+    wait_seconds = await check_admission()
+
+    # Nova tentativa, com um prazo novo de mesma duração
+    task_payload = json.loads(raw_payload)
+    task_payload["attempt"] = task_payload.get("attempt", 1) + 1
+    task_payload["deadline"] = time.time() + task_payload.get("deadline_seconds", TASK_DEADLINE_SECONDS)
+    raw_payload = json.dumps(task_payload)
+    await redis_client.set(TASK_PAYLOAD_KEY_PREFIX + task_id, raw_payload, ex=TASK_PAYLOAD_TTL_SECONDS)
+    await redis_client.delete(TASK_ERROR_KEY_PREFIX + task_id, TASK_CANCELLED_KEY_PREFIX + task_id)
+    await redis_client.lpush(TASK_QUEUE_NAME, raw_payload)
+    logger.info(f"Tarefa {task_id} reenfileirada (tentativa {task_payload['attempt']}).")
+
+    return TaskStatus(task_id=task_id, status="PENDING",
+                      estimated_completion_seconds=round(wait_seconds, 1) if wait_seconds is not None else None)
+
+
+@app.delete("/api/task/{task_id}", response_model=TaskStatus, summary="Cancelar uma tarefa")
+async def cancel_task(task_id: str, request: Request):
+    """
+    Cancela a tarefa: se ainda estiver na fila, é removida dela; se já estiver em
+    execução, o worker vê o sinal no Redis e para no próximo ponto de verificação
+    (entre passos, lotes de embeddings ou tentativas do LLM).
+    Numa tarefa compartilhada por coalescência, o pedido só retira o interesse
+    deste cliente (status WITHDRAWN: a tarefa segue para os demais); ela é
+    cancelada quando não resta nenhum interessado. Um cliente que não está entre
+    os interessados recebe 403.
+    """
+    if not redis_client:
+        raise HTTPException(status_code=503, detail="Serviço de fila indisponível (Redis).")
+
+    if await asyncio.to_thread(os.path.exists, os.path.join(OUTPUT_DIR, f"{task_id}.json")):
+        raise HTTPException(status_code=409, detail="A tarefa já foi concluída.")
+
+    raw_payload = await redis_client.get(TASK_PAYLOAD_KEY_PREFIX + task_id)
+    if not raw_payload:
+        raise HTTPException(status_code=404, detail="Tarefa não encontrada ou expirada.")
+
+    dropped, remaining = await drop_caller(task_id, get_caller_id(request))
+    if remaining is not None and not dropped:
+        raise HTTPException(status_code=403, detail="Este cliente não está entre os interessados na tarefa.")
+    if remaining:
+        logger.info(f"Cliente desistiu da tarefa {task_id}; {remaining} interessado(s) restante(s).")
+        return TaskStatus(task_id=task_id, status="WITHDRAWN")
+
+    await redis_client.set(TASK_CANCELLED_KEY_PREFIX + task_id, "1", ex=TASK_PAYLOAD_TTL_SECONDS)
+    removed = await redis_client.lrem(TASK_QUEUE_NAME, 0, raw_payload)
+    await forget_inflight_task(task_id)
+    logger.info(f"Tarefa {task_id} cancelada ({'removida da fila' if removed else 'sinalizada ao worker'}).")
+
+    return TaskStatus(task_id=task_id, status="CANCELLED")
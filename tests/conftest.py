@@ -0,0 +1,23 @@
+import pytest
+
+from tools import tracing
+from tools.checkpoint_store import LocalCheckpointStore, set_checkpoint_store
+
+
+@pytest.fixture(autouse=True)
+def isolated_trace_exporter(tmp_path):
+    """Redireciona os spans gerados nos testes para um arquivo temporário."""
+    exporter = tracing.JsonLinesSpanExporter(file_path=str(tmp_path / "spans.jsonl"))
+    tracing.set_exporter(exporter)
+    yield exporter
+    tracing.set_exporter(None)
+    exporter.shutdown()
+
+
+@pytest.fixture(autouse=True)
+def isolated_checkpoint_store(tmp_path):
+    """Checkpoints de workflow gravados em um diretório temporário."""
+    store = LocalCheckpointStore(base_dir=str(tmp_path / "checkpoints"))
+    set_checkpoint_store(store)
+    yield store
+    set_checkpoint_store(None)
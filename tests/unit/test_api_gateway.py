@@ -0,0 +1,278 @@
+import json
+import time
+
+import pytest
+import redis
+from fastapi.testclient import TestClient
+
+from benchmarks.fake_redis import AsyncInMemoryRedis, InMemoryRedis
+from server import main as gateway
+
+
+@pytest.fixture
+def fake_redis(monkeypatch, tmp_path):
+    client = InMemoryRedis()
+    monkeypatch.setattr(gateway, "redis_client", AsyncInMemoryRedis(client))
+    monkeypatch.setattr(gateway, "INPUT_DIR", str(tmp_path / "input"))
+    monkeypatch.setattr(gateway, "OUTPUT_DIR", str(tmp_path / "output"))
+    (tmp_path / "input").mkdir()
+    (tmp_path / "output").mkdir()
+    return client
+
+
+def test_fingerprint_normalizes_query():
+    a = gateway.compute_fingerprint(b"%PDF-1", "  Qual o  TOTAL? ", "default_pdf_analysis")
+    b = gateway.compute_fingerprint(b"%PDF-1", "qual o total?", "default_pdf_analysis")
+    assert a == b
+    assert a != gateway.compute_fingerprint(b"%PDF-2", "qual o total?", "default_pdf_analysis")
+    assert a != gateway.compute_fingerprint(b"%PDF-1", "qual o total?", "project_invoice_extract")
+
+
+def test_duplicate_submissions_share_one_task(fake_redis, tmp_path):
+    client = TestClient(gateway.app)
+    files = {"file": ("doc.pdf", b"%PDF-1.4 mesmo conteudo", "application/pdf")}
+    alice, bob = {"X-Client-Id": "alice"}, {"X-Client-Id": "bob"}
+
+    first = client.post("/api/process-document", data={"query": "Resumo"}, files=files, headers=alice).json()
+    second = client.post("/api/process-document", data={"query": " resumo "}, files=files, headers=bob).json()
+    # Reenvios impacientes do mesmo cliente não contam como outro interessado
+    client.post("/api/process-document", data={"query": "Resumo"}, files=files, headers=bob)
+
+    assert second["task_id"] == first["task_id"]
+    assert second["coalesced"] is True
+    assert len(fake_redis.data[gateway.TASK_QUEUE_NAME]) == 1
+
+    # O resultado compartilhado só é removido depois que ambos os clientes o leram
+    report = tmp_path / "output" / f"{first['task_id']}.json"
+    report.write_text('{"report_content": "ok"}')
+    assert client.get(f"/api/task-status/{first['task_id']}", headers=alice).json()["status"] == "SUCCESS"
+    assert client.get(f"/api/task-status/{first['task_id']}", headers=alice).json()["status"] == "SUCCESS"
+    assert report.exists()
+    assert client.get(f"/api/task-status/{first['task_id']}", headers=bob).json()["status"] == "SUCCESS"
+    assert not report.exists()
+
+    # Depois de entregue, uma nova submissão idêntica gera uma nova tarefa
+    third = client.post("/api/process-document", data={"query": "Resumo"}, files=files, headers=alice).json()
+    assert third["task_id"] != first["task_id"]
+
+
+def test_anonymous_callers_count_once_per_submission(fake_redis, tmp_path):
+    # Sem X-Client-Id (ex.: vários usuários atrás do mesmo NAT) cada submissão é um interessado
+    client = TestClient(gateway.app)
+    files = {"file": ("doc.pdf", b"%PDF-1.4", "application/pdf")}
+    task_id = client.post("/api/process-document", data={"query": "Resumo"}, files=files).json()["task_id"]
+    assert client.post("/api/process-document", data={"query": "Resumo"}, files=files).json()["task_id"] == task_id
+
+    report = tmp_path / "output" / f"{task_id}.json"
+    report.write_text('{"report_content": "ok"}')
+    assert client.get(f"/api/task-status/{task_id}").json()["status"] == "SUCCESS"
+    assert report.exists()
+    assert client.get(f"/api/task-status/{task_id}").json()["status"] == "SUCCESS"
+    assert not report.exists()
+
+
+def test_rejects_with_retry_after_when_queue_is_full(fake_redis, monkeypatch):
+    monkeypatch.setattr(gateway, "MAX_QUEUE_DEPTH", 2)
+    fake_redis.data[gateway.TASK_QUEUE_NAME] = ["t1", "t2"]
+    fake_redis.data[gateway.STATS_STAGE_KEY] = {"ExtractionAgent": "2.0", "AnalysisAgent": "8.0"}
+    client = TestClient(gateway.app)
+
+    response = client.post("/api/process-document", data={"query": "Resumo"},
+                           files={"file": ("doc.pdf", b"%PDF-1.4", "application/pdf")})
+
+    assert response.status_code == 429
+    # Um worker (10s por tarefa) precisa drenar 1 tarefa excedente
+    assert response.headers["Retry-After"] == "10"
+
+
+def test_reports_estimated_completion_from_stage_stats(fake_redis):
+    fake_redis.data[gateway.TASK_QUEUE_NAME] = ["t1"]
+    fake_redis.data[gateway.STATS_STAGE_KEY] = {"ExtractionAgent": "2.0", "AnalysisAgent": "8.0"}
+    client = TestClient(gateway.app)
+
+    accepted = client.post("/api/process-document", data={"query": "Resumo"},
+                           files={"file": ("doc.pdf", b"%PDF-1.4", "application/pdf")}).json()
+
+    assert accepted["estimated_completion_seconds"] == 20.0
+    status = client.get(f"/api/task-status/{accepted['task_id']}").json()
+    assert status["status"] == "PROCESSING"
+    assert 0 < status["estimated_completion_seconds"] <= 20.0
+
+
+def test_per_client_rate_limit(fake_redis, monkeypatch):
+    monkeypatch.setattr(gateway, "RATE_LIMIT_PER_MINUTE", 1)
+    client = TestClient(gateway.app)
+
+    def submit(client_id, content):
+        return client.post("/api/process-document", data={"query": "Resumo"}, headers={"X-Client-Id": client_id},
+                           files={"file": ("doc.pdf", content, "application/pdf")})
+
+    assert submit("cliente-a", b"%PDF-a").status_code == 200
+    limited = submit("cliente-a", b"%PDF-b")
+    assert limited.status_code == 429
+    assert int(limited.headers["Retry-After"]) >= 1
+    assert submit("cliente-b", b"%PDF-c").status_code == 200
+
+
+def test_failed_task_can_be_retried(fake_redis):
+    client = TestClient(gateway.app)
+    task_id = client.post("/api/process-document", data={"query": "Resumo"},
+                          files={"file": ("doc.pdf", b"%PDF-1.4", "application/pdf")}).json()["task_id"]
+    fake_redis.brpop(gateway.TASK_QUEUE_NAME)
+
+    # Ainda em execução: retry recusado
+    assert client.post(f"/api/task/{task_id}/retry").status_code == 409
+
+    fake_redis.set(gateway.TASK_ERROR_KEY_PREFIX + task_id, "LLM call failed")
+    failed = client.get(f"/api/task-status/{task_id}").json()
+    assert failed["status"] == "FAILED" and failed["error"] == "LLM call failed"
+
+    retried = client.post(f"/api/task/{task_id}/retry")
+    assert retried.status_code == 200 and retried.json()["status"] == "PENDING"
+    _, queued = fake_redis.brpop(gateway.TASK_QUEUE_NAME)
+    assert json.loads(queued)["task_id"] == task_id and json.loads(queued)["attempt"] == 2
+    assert client.get(f"/api/task-status/{task_id}").json()["status"] == "PROCESSING"
+
+    assert client.post("/api/task/inexistente/retry?force=true").status_code == 404
+
+
+def test_profile_flag_is_forwarded_to_worker(fake_redis):
+    client = TestClient(gateway.app)
+    client.post("/api/process-document", data={"query": "Resumo", "profile": "true"},
+                files={"file": ("a.pdf", b"%PDF-1.4 a", "application/pdf")})
+    client.post("/api/process-document", data={"query": "Resumo"},
+                files={"file": ("b.pdf", b"%PDF-1.4 b", "application/pdf")})
+
+    profiled = json.loads(fake_redis.brpop(gateway.TASK_QUEUE_NAME)[1])
+    default = json.loads(fake_redis.brpop(gateway.TASK_QUEUE_NAME)[1])
+    assert profiled["profile"] is True
+    assert "profile" not in default
+
+
+def test_cancel_removes_queued_task_and_sets_deadline(fake_redis):
+    client = TestClient(gateway.app)
+    task_id = client.post("/api/process-document", data={"query": "Resumo", "deadline_seconds": "30"},
+                          files={"file": ("doc.pdf", b"%PDF-1.4", "application/pdf")}).json()["task_id"]
+    payload = json.loads(fake_redis.get(gateway.TASK_PAYLOAD_KEY_PREFIX + task_id))
+    assert payload["deadline_seconds"] == 30
+    assert 0 < payload["deadline"] - time.time() <= 30
+
+    cancelled = client.delete(f"/api/task/{task_id}")
+    assert cancelled.status_code == 200 and cancelled.json()["status"] == "CANCELLED"
+    assert fake_redis.llen(gateway.TASK_QUEUE_NAME) == 0
+    assert client.get(f"/api/task-status/{task_id}").json()["status"] == "CANCELLED"
+
+    # Uma submissão idêntica depois do cancelamento não se anexa à tarefa cancelada
+    again = client.post("/api/process-document", data={"query": "Resumo"},
+                        files={"file": ("doc.pdf", b"%PDF-1.4", "application/pdf")}).json()
+    assert again["task_id"] != task_id and again["coalesced"] is False
+
+
+def test_cancel_by_one_caller_keeps_shared_task(fake_redis):
+    client = TestClient(gateway.app)
+    files = {"file": ("doc.pdf", b"%PDF-1.4", "application/pdf")}
+    alice, bob = {"X-Client-Id": "alice"}, {"X-Client-Id": "bob"}
+    task_id = client.post("/api/process-document", data={"query": "Resumo"}, files=files, headers=alice).json()["task_id"]
+    assert client.post("/api/process-document", data={"query": "Resumo"}, files=files, headers=bob).json()["coalesced"]
+
+    # Quem não é interessado na tarefa não pode cancelá-la
+    for stranger in ({"X-Client-Id": "mallory"}, {}):
+        assert client.delete(f"/api/task/{task_id}", headers=stranger).status_code == 403
+    assert fake_redis.llen(gateway.TASK_QUEUE_NAME) == 1
+
+    # Bob desiste: a tarefa continua na fila para Alice
+    assert client.delete(f"/api/task/{task_id}", headers=bob).json()["status"] == "WITHDRAWN"
+    assert client.delete(f"/api/task/{task_id}", headers=bob).status_code == 403
+    assert fake_redis.llen(gateway.TASK_QUEUE_NAME) == 1
+    assert client.get(f"/api/task-status/{task_id}", headers=alice).json()["status"] == "PROCESSING"
+
+    # Sem interessados restantes a tarefa é cancelada de fato
+    assert client.delete(f"/api/task/{task_id}", headers=alice).json()["status"] == "CANCELLED"
+    assert fake_redis.llen(gateway.TASK_QUEUE_NAME) == 0
+    assert client.get(f"/api/task-status/{task_id}", headers=alice).json()["status"] == "CANCELLED"
+
+
+def test_deadline_is_validated_and_respected_by_coalescing(fake_redis):
+    client = TestClient(gateway.app)
+    files = {"file": ("doc.pdf", b"%PDF-1.4", "application/pdf")}
+    for invalid in ("-5", "0"):
+        response = client.post("/api/process-document", data={"query": "Resumo", "deadline_seconds": invalid},
+                               files=files)
+        assert response.status_code == 422
+    assert fake_redis.llen(gateway.TASK_QUEUE_NAME) == 0
+
+    first = client.post("/api/process-document", data={"query": "Resumo", "deadline_seconds": "60"},
+                        files=files).json()
+    # Prazo igual ou menor: compartilha a tarefa; prazo maior: tarefa própria
+    shorter = client.post("/api/process-document", data={"query": "Resumo", "deadline_seconds": "30"},
+                          files=files).json()
+    longer = client.post("/api/process-document", data={"query": "Resumo", "deadline_seconds": "600"},
+                         files=files).json()
+    assert shorter["task_id"] == first["task_id"]
+    assert longer["task_id"] != first["task_id"] and longer["coalesced"] is False
+    assert fake_redis.llen(gateway.TASK_QUEUE_NAME) == 2
+
+
+def test_resubmission_after_failure_creates_new_task(fake_redis):
+    client = TestClient(gateway.app)
+    files = {"file": ("doc.pdf", b"%PDF-1.4", "application/pdf")}
+    first = client.post("/api/process-document", data={"query": "Resumo"}, files=files).json()
+    fake_redis.brpop(gateway.TASK_QUEUE_NAME)
+    # Como o worker registra a falha
+    fake_redis.set(gateway.TASK_ERROR_KEY_PREFIX + first["task_id"], "LLM call failed")
+
+    # Reenviar o mesmo pedido não se anexa à tarefa morta: é enfileirada outra
+    again = client.post("/api/process-document", data={"query": "Resumo"}, files=files).json()
+    assert again["task_id"] != first["task_id"] and again["coalesced"] is False
+    assert fake_redis.llen(gateway.TASK_QUEUE_NAME) == 1
+    assert client.get(f"/api/task-status/{first['task_id']}").json()["status"] == "FAILED"
+
+
+class UnreachableRedis:
+    """Cliente cujos comandos falham, como quando o Redis cai."""
+
+    def __init__(self):
+        self.connection_pool = self
+        self.disconnected = False
+
+    def __getattr__(self, name):
+        async def command(*args, **kwargs):
+            raise redis.exceptions.ConnectionError("Connection refused")
+        return command
+
+    async def disconnect(self):
+        self.disconnected = True
+
+
+def test_health_check_reconnects_when_redis_drops(monkeypatch):
+    dropped = UnreachableRedis()
+    monkeypatch.setattr(gateway, "redis_client", dropped)
+    monkeypatch.setattr(gateway, "create_redis_client", UnreachableRedis)
+    monkeypatch.setattr(gateway, "REDIS_POOL_DRAIN_SECONDS", 0.05)
+
+    with TestClient(gateway.app) as client:
+        # Reconexão também falha: 503 e o pool antigo é descartado...
+        assert client.get("/").status_code == 503
+        assert gateway.redis_client is None
+        # ...só depois do prazo, sem derrubar requisições que ainda o usam
+        assert not dropped.disconnected
+        time.sleep(0.3)
+        assert dropped.disconnected
+
+        # Redis de volta: o próximo health check recria o pool
+        healthy = AsyncInMemoryRedis()
+        monkeypatch.setattr(gateway, "create_redis_client", lambda: healthy)
+        assert client.get("/").status_code == 200
+        assert gateway.redis_client is healthy
+
+
+def test_redis_outage_returns_503(monkeypatch, tmp_path):
+    monkeypatch.setattr(gateway, "redis_client", UnreachableRedis())
+    monkeypatch.setattr(gateway, "OUTPUT_DIR", str(tmp_path))
+    client = TestClient(gateway.app)
+
+    assert client.get("/api/task-status/T-1").status_code == 503
+    assert client.delete("/api/task/T-1").status_code == 503
+    response = client.post("/api/process-document", data={"query": "Resumo"},
+                           files={"file": ("doc.pdf", b"%PDF-1.4", "application/pdf")})
+    assert response.status_code == 503
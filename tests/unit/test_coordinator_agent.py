@@ -0,0 +1,162 @@
+import json
+import os
+import subprocess
+import time
+import sys
+import threading
+import types
+import pytest
+
+from agents import coordinator_agent
+
+
+def test_import_coordinator_does_not_load_heavy_dependencies():
+    """O coordenador não deve importar chromadb/torch/genai no startup do worker."""
+    # Roda em um processo limpo para não depender da ordem dos testes
+    code = (
+        "import sys, agents.coordinator_agent; "
+        "heavy = ['chromadb', 'sentence_transformers', 'google.generativeai', "
+        "'agents.memory_agent', 'agents.analysis_agent']; "
+        "print([m for m in heavy if m in sys.modules])"
+    )
+    repo_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    output = subprocess.check_output([sys.executable, "-c", code], cwd=repo_root, text=True)
+    assert output.strip() == "[]"
+
+
+def test_load_agent_class_is_lazy_and_cached():
+    AgentClass = coordinator_agent.load_agent_class("DeliveryAgent")
+    assert AgentClass.__name__ == "DeliveryAgent"
+    assert coordinator_agent.load_agent_class("DeliveryAgent") is AgentClass
+    assert "DeliveryAgent" in coordinator_agent.get_warm_agents()
+
+
+def test_load_agent_class_unknown_agent():
+    with pytest.raises(ValueError):
+        coordinator_agent.load_agent_class("AgenteInexistente")
+
+
+def test_slow_agent_import_does_not_block_other_agents(monkeypatch):
+    release_slow = threading.Event()
+
+    def import_module(name):
+        if name == "slow_module":
+            release_slow.wait(5)
+        return types.SimpleNamespace(Agent=type(name, (), {}))
+
+    monkeypatch.setattr(coordinator_agent, "importlib", types.SimpleNamespace(import_module=import_module))
+    monkeypatch.setattr(coordinator_agent, "_agent_classes", {})
+    monkeypatch.setitem(coordinator_agent.AGENT_MODULES, "Slow", ("slow_module", "Agent"))
+    monkeypatch.setitem(coordinator_agent.AGENT_MODULES, "Fast", ("fast_module", "Agent"))
+
+    preload = threading.Thread(target=coordinator_agent.load_agent_class, args=("Slow",))
+    preload.start()
+    try:
+        start = time.monotonic()
+        assert coordinator_agent.load_agent_class("Fast").__name__ == "fast_module"
+        assert time.monotonic() - start < 1
+    finally:
+        release_slow.set()
+        preload.join()
+    assert coordinator_agent.get_warm_agents() == ["Fast", "Slow"]
+
+
+def test_profiled_task_saves_artifacts_next_to_report(tmp_path, monkeypatch):
+    from agents import delivery_agent
+
+    monkeypatch.setattr(delivery_agent, "OUTPUT_DIR", str(tmp_path))
+    monkeypatch.setattr(coordinator_agent, "load_workflow_config",
+                        lambda name: {"tasks_sequence": [{"agent": "DeliveryAgent", "command": "format_final_report"}]})
+
+    payload = {"task_id": "T-PROF", "user_request": "Resumo", "output_data": "ok", "profile": True}
+    result = coordinator_agent.process_task_from_api(payload)
+
+    assert result["status"] == "success"
+    assert (tmp_path / "T-PROF.json").exists()
+    assert (tmp_path / "T-PROF.profile.prof").exists()
+    summary = json.loads((tmp_path / "T-PROF.profile.json").read_text())
+    assert [step["agent"] for step in summary["steps"]] == ["DeliveryAgent"]
+    assert "top_allocations" in summary["steps"][0]
+
+
+class CountingAgent:
+    """Agente de teste: conta execuções e falha enquanto `failures` > 0."""
+
+    calls = {}
+    failures = {}
+
+    def execute(self, input_data, user_request, command, task_id):
+        CountingAgent.calls[command] = CountingAgent.calls.get(command, 0) + 1
+        if CountingAgent.failures.get(command, 0) > 0:
+            CountingAgent.failures[command] -= 1
+            return {"status": "error", "message": "timeout simulado"}
+        return {"status": "processing", "output_data": f"{input_data.get('output_data', '')}>{command}"}
+
+
+def test_retry_resumes_from_first_incomplete_step(monkeypatch, isolated_checkpoint_store):
+    steps = [{"agent": "Counting", "command": name} for name in ("extrair", "embeddings", "analisar", "entregar")]
+    monkeypatch.setattr(coordinator_agent, "load_workflow_config", lambda name: {"tasks_sequence": steps})
+    monkeypatch.setitem(coordinator_agent._agent_classes, "Counting", CountingAgent)
+    monkeypatch.setattr(CountingAgent, "calls", {})
+    monkeypatch.setattr(CountingAgent, "failures", {"analisar": 1})
+    payload = {"task_id": "T-RETRY", "user_request": "Resumo", "output_data": "pdf"}
+
+    first = coordinator_agent.process_task_from_api(payload)
+    assert first["status"] == "error"
+    assert isolated_checkpoint_store.load("T-RETRY", 1)["output"]["output_data"] == "pdf>extrair>embeddings"
+
+    second = coordinator_agent.process_task_from_api(payload)
+    assert second["status"] == "success"
+    assert second["result"] == "pdf>extrair>embeddings>analisar>entregar"
+    assert CountingAgent.calls == {"extrair": 1, "embeddings": 1, "analisar": 2, "entregar": 1}
+    # O agente tem passos restaurados de checkpoint: seu tempo não entra nas estatísticas
+    assert second["timings"] == {}
+    # Concluída a tarefa, os checkpoints são descartados
+    assert isolated_checkpoint_store.load("T-RETRY", 0) is None
+
+
+def test_local_checkpoints_of_abandoned_tasks_are_swept(tmp_path):
+    from tools.checkpoint_store import LocalCheckpointStore
+
+    base_dir = tmp_path / "checkpoints"
+    store = LocalCheckpointStore(base_dir=str(base_dir), ttl_seconds=60)
+    store.save("T-ABANDONED", 0, {"output": {}})
+    two_minutes_ago = time.time() - 120
+    os.utime(base_dir / "T-ABANDONED" / "0.json", (two_minutes_ago, two_minutes_ago))
+
+    # O primeiro save de um store varre os diretórios expirados
+    LocalCheckpointStore(base_dir=str(base_dir), ttl_seconds=60).save("T-NEW", 0, {"output": {}})
+    assert sorted(os.listdir(base_dir)) == ["T-NEW"]
+
+
+def test_redis_checkpoints_are_cleared_despite_gaps():
+    fakeredis = pytest.importorskip("fakeredis")
+    from tools.checkpoint_store import RedisCheckpointStore
+
+    store = RedisCheckpointStore(fakeredis.FakeRedis())
+    for step_index in (0, 2, 3):
+        store.save("T-GAP", step_index, {"output": {}})
+    store.save("T-OTHER", 0, {"output": {}})
+
+    store.clear("T-GAP")
+    assert [store.load("T-GAP", i) for i in range(4)] == [None] * 4
+    assert store.load("T-OTHER", 0) is not None
+
+
+def test_expired_or_cancelled_task_stops_between_steps(monkeypatch):
+    steps = [{"agent": "Counting", "command": name} for name in ("extrair", "analisar")]
+    monkeypatch.setattr(coordinator_agent, "load_workflow_config", lambda name: {"tasks_sequence": steps})
+    monkeypatch.setitem(coordinator_agent._agent_classes, "Counting", CountingAgent)
+    monkeypatch.setattr(CountingAgent, "calls", {})
+    monkeypatch.setattr(CountingAgent, "failures", {})
+
+    expired = coordinator_agent.process_task_from_api(
+        {"task_id": "T-EXP", "user_request": "Resumo", "deadline": time.time() - 1})
+    assert expired["status"] == "expired"
+    assert CountingAgent.calls == {}
+
+    cancelled = coordinator_agent.process_task_from_api(
+        {"task_id": "T-CANCEL", "user_request": "Resumo"},
+        is_cancelled=lambda: CountingAgent.calls.get("extrair", 0) > 0)
+    assert cancelled["status"] == "cancelled"
+    assert CountingAgent.calls == {"extrair": 1}
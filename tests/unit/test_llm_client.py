@@ -0,0 +1,135 @@
+import time
+
+import pytest
+
+from tools.llm_client import (
+    FakeProvider, LLMClient, LLMError, LocalTokenBucket, LLMResponse, RedisTokenBucket, TransientLLMError,
+    acquire_token,
+)
+
+
+class ScriptedProvider:
+    """Provedor que falha/atrasa conforme um roteiro, uma entrada por chamada."""
+
+    name = "scripted"
+    model_name = "scripted-llm"
+
+    def __init__(self, script):
+        self.script = list(script)
+        self.calls = 0
+
+    def generate(self, prompt, timeout):
+        step = self.script[min(self.calls, len(self.script) - 1)]
+        self.calls += 1
+        if isinstance(step, Exception):
+            raise step
+        time.sleep(step)
+        return LLMResponse(f"ok-{self.calls}")
+
+
+def test_retries_transient_errors_with_backoff():
+    provider = ScriptedProvider([TransientLLMError(429, "quota"), TransientLLMError(503, "indisponível"), 0])
+    client = LLMClient(provider, max_retries=3, backoff_base=0.01)
+
+    assert client.generate("prompt").text == "ok-3"
+    assert provider.calls == 3
+
+
+def test_non_retryable_error_fails_immediately():
+    provider = ScriptedProvider([ValueError("prompt inválido")])
+    client = LLMClient(provider, max_retries=3, backoff_base=0.01)
+
+    with pytest.raises(LLMError):
+        client.generate("prompt")
+    assert provider.calls == 1
+
+
+def test_gives_up_after_max_retries():
+    provider = ScriptedProvider([TransientLLMError(500, "erro")])
+    client = LLMClient(provider, max_retries=2, backoff_base=0.01)
+
+    with pytest.raises(LLMError):
+        client.generate("prompt")
+    assert provider.calls == 3
+
+
+def test_hedged_request_returns_the_fastest_response():
+    provider = ScriptedProvider([1.0, 0.01])
+    client = LLMClient(provider, hedge_after=0.05)
+
+    start = time.monotonic()
+    response = client.generate("prompt")
+
+    assert response.text == "ok-2"
+    assert time.monotonic() - start < 0.5
+
+
+def test_hedge_stragglers_are_bounded():
+    # 1ª chamada: primária lenta (perdedora) e cópia rápida; 2ª: primária lenta sem vaga para hedge
+    provider = ScriptedProvider([0.5, 0.01, 0.1, 0.01])
+    client = LLMClient(provider, hedge_after=0.02, max_concurrent_calls=1, max_hedges_in_flight=1)
+
+    assert client.generate("prompt").text == "ok-2"
+    assert client.generate("prompt").text == "ok-3"
+    assert provider.calls == 3
+
+    # Terminada a retardatária, a vaga volta e o hedge também
+    time.sleep(0.5)
+    provider.script = [0.5, 0.01]
+    provider.calls = 0
+    assert client.generate("prompt").text == "ok-2"
+
+
+def test_token_bucket_blocks_after_burst():
+    bucket = LocalTokenBucket(rate_per_second=20, capacity=2)
+    start = time.monotonic()
+    for _ in range(3):
+        acquire_token(bucket, deadline=time.monotonic() + 1)
+    assert time.monotonic() - start >= 0.04
+
+    with pytest.raises(TimeoutError):
+        acquire_token(LocalTokenBucket(rate_per_second=0.1, capacity=0), deadline=time.monotonic() + 0.1)
+
+
+def test_fake_provider_is_deterministic():
+    client = LLMClient(FakeProvider(latency=0))
+    assert client.generate("mesmo prompt").text == client.generate("mesmo prompt").text
+    assert client.generate("mesmo prompt").usage["prompt_tokens"] == 2
+
+
+def test_cancel_check_interrupts_before_next_attempt():
+    provider = ScriptedProvider([TransientLLMError(503, "indisponível"), 0])
+    client = LLMClient(provider, max_retries=3, backoff_base=0.01)
+
+    def cancel_after_first_attempt():
+        if provider.calls:
+            raise RuntimeError("cancelada")
+
+    with pytest.raises(RuntimeError, match="cancelada"):
+        client.generate("prompt", cancel_check=cancel_after_first_attempt)
+    assert provider.calls == 1
+
+
+def test_redis_token_bucket_is_shared_between_workers():
+    fakeredis = pytest.importorskip("fakeredis")
+    server = fakeredis.FakeServer()
+    worker_a = RedisTokenBucket(fakeredis.FakeRedis(server=server), rate_per_second=1, capacity=2)
+    worker_b = RedisTokenBucket(fakeredis.FakeRedis(server=server), rate_per_second=1, capacity=2)
+
+    assert worker_a.try_acquire() == 0
+    assert worker_b.try_acquire() == 0
+    # O burst é global: o terceiro token, em qualquer worker, precisa esperar o refil
+    assert 0.9 < worker_a.try_acquire() <= 1.0
+
+
+def test_redis_token_bucket_falls_back_to_local_when_redis_is_down():
+    fakeredis = pytest.importorskip("fakeredis")
+    server = fakeredis.FakeServer()
+    bucket = RedisTokenBucket(fakeredis.FakeRedis(server=server), rate_per_second=1, capacity=1)
+    server.connected = False
+
+    assert bucket.try_acquire() == 0
+    assert bucket.try_acquire() > 0
+
+    server.connected = True
+    assert bucket.try_acquire() == 0
@@ -0,0 +1,36 @@
+import argparse
+import asyncio
+
+from benchmarks.fake_redis import InMemoryRedis
+from benchmarks.load_test import FakeWorker, LocalGateway, percentile, run_load
+from server import main as gateway
+
+
+def test_percentile_nearest_rank():
+    values = [float(v) for v in range(1, 101)]
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 99) == 99.0
+    assert percentile([], 50) is None
+
+
+def test_short_local_run_reports_latencies_and_queue_depth(tmp_path):
+    redis_client = InMemoryRedis()
+    original_output_dir = gateway.OUTPUT_DIR
+    server = LocalGateway(redis_client, str(tmp_path)).start()
+    worker = FakeWorker(redis_client, server.output_dir, {"AnalysisAgent": 0.01}, jitter=0.0)
+    worker.start()
+    args = argparse.Namespace(duplicate_ratio=0.0, clients=100, task_timeout=10.0, poll_interval=0.05,
+                              max_connections=50, request_timeout=5.0, sample_interval=0.2)
+    try:
+        summary = asyncio.run(run_load(server.base_url, redis_client, [(20.0, 0.5)], args))
+    finally:
+        worker.stopped.set()
+        server.stop()
+
+    assert summary["submit"]["count"] == summary["offered_requests"] > 0
+    assert summary["submit"]["error_rate"] == 0
+    assert summary["end_to_end"]["count"] == summary["offered_requests"]
+    assert summary["end_to_end"]["timed_out"] == 0
+    assert summary["queue_depth"]
+    # O gateway volta ao estado original ao final
+    assert gateway.OUTPUT_DIR == original_output_dir
@@ -0,0 +1,30 @@
+import pytest
+
+import main
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+@pytest.fixture
+def redis_server():
+    return fakeredis.FakeRedis(decode_responses=True)
+
+
+def test_stage_stats_are_updated_atomically_with_ewma(redis_server):
+    main.record_task_stats(redis_server, "T-1", {"status": "success", "timings": {"AnalysisAgent": 10.0}})
+    main.record_task_stats(redis_server, "T-2", {"status": "success",
+                                                 "timings": {"AnalysisAgent": 20.0, "MemoryAgent": 4.0}})
+
+    stages = redis_server.hgetall(main.STATS_STAGE_KEY)
+    assert float(stages["AnalysisAgent"]) == pytest.approx(0.2 * 20.0 + 0.8 * 10.0)
+    assert float(stages["MemoryAgent"]) == pytest.approx(4.0)
+    assert redis_server.zcard(main.STATS_COMPLETIONS_KEY) == 2
+
+
+def test_only_successful_tasks_count_towards_throughput(redis_server):
+    for status in ("error", "expired", "cancelled"):
+        main.record_task_stats(redis_server, "T-1", {"status": status, "timings": {"AnalysisAgent": 0.1}})
+    main.record_task_stats(redis_server, "T-2", None)
+
+    assert redis_server.hgetall(main.STATS_STAGE_KEY) == {}
+    assert redis_server.zcard(main.STATS_COMPLETIONS_KEY) == 0
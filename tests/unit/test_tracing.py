@@ -0,0 +1,65 @@
+import json
+
+from tools import tracing
+from tools.tracing import JsonLinesSpanExporter, start_span
+
+
+def test_spans_are_nested_and_exported_as_otlp_json_lines(tmp_path):
+    trace_file = tmp_path / "spans.jsonl"
+    exporter = JsonLinesSpanExporter(file_path=str(trace_file))
+    tracing.set_exporter(exporter)
+    try:
+        with start_span("task", **{"task.id": "T-1"}) as root:
+            with start_span("pdf.chunk") as child:
+                child.set_attribute("chunk.count", 3)
+        exporter.flush()
+    finally:
+        tracing.set_exporter(None)
+        exporter.shutdown()
+
+    spans = []
+    for line in trace_file.read_text().splitlines():
+        request = json.loads(line)
+        for scope in request["resourceSpans"][0]["scopeSpans"]:
+            spans.extend(scope["spans"])
+
+    by_name = {span["name"]: span for span in spans}
+    assert set(by_name) == {"task", "pdf.chunk"}
+    assert by_name["pdf.chunk"]["traceId"] == by_name["task"]["traceId"] == root.trace_id
+    assert by_name["pdf.chunk"]["parentSpanId"] == by_name["task"]["spanId"]
+    assert {"key": "chunk.count", "value": {"intValue": "3"}} in by_name["pdf.chunk"]["attributes"]
+    assert int(by_name["task"]["endTimeUnixNano"]) >= int(by_name["task"]["startTimeUnixNano"])
+
+
+def test_span_records_exception(tmp_path):
+    exporter = JsonLinesSpanExporter(file_path=str(tmp_path / "spans.jsonl"))
+    tracing.set_exporter(exporter)
+    try:
+        try:
+            with start_span("llm.generate") as span:
+                raise TimeoutError("deadline")
+        except TimeoutError:
+            pass
+    finally:
+        tracing.set_exporter(None)
+        exporter.shutdown()
+
+    assert span.error == "TimeoutError: deadline"
+    assert span.to_otlp()["status"]["code"] == 2
+
+
+def test_trace_file_is_rotated_by_size(tmp_path):
+    trace_file = tmp_path / "spans.jsonl"
+    exporter = JsonLinesSpanExporter(file_path=str(trace_file), max_bytes=1, backup_count=2)
+    tracing.set_exporter(exporter)
+    try:
+        for index in range(4):
+            with start_span("step", index=index):
+                pass
+            exporter.flush()
+    finally:
+        tracing.set_exporter(None)
+        exporter.shutdown()
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["spans.jsonl", "spans.jsonl.1", "spans.jsonl.2"]
+    assert '"intValue": "3"' in trace_file.read_text()
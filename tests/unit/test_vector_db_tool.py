@@ -0,0 +1,66 @@
+import zlib
+
+import pytest
+
+from tools import embedding_backends
+from tools.embedding_backends import EmbeddingBackend, collection_name_for, get_embedding_backend
+
+
+class HashingBackend(EmbeddingBackend):
+    """Backend determinístico (bag-of-words com hashing) para testes sem modelos."""
+
+    name = "hashing"
+    dimension = 64
+
+    def encode(self, texts):
+        vectors = []
+        for text in texts:
+            vector = [0.0] * self.dimension
+            for word in text.lower().split():
+                vector[zlib.crc32(word.encode()) % self.dimension] += 1.0
+            vectors.append(vector)
+        return vectors
+
+
+class CoarseHashingBackend(HashingBackend):
+    name = "coarse"
+    dimension = 8
+
+
+@pytest.fixture
+def fake_backends(monkeypatch):
+    monkeypatch.setitem(embedding_backends.BACKENDS, HashingBackend.name, HashingBackend)
+    monkeypatch.setitem(embedding_backends.BACKENDS, CoarseHashingBackend.name, CoarseHashingBackend)
+    monkeypatch.setattr(embedding_backends, "_backend_cache", {})
+
+
+def test_backend_is_loaded_once_per_process(fake_backends):
+    first = get_embedding_backend("hashing", "modelo-x")
+    assert get_embedding_backend("hashing", "modelo-x") is first
+    assert get_embedding_backend("hashing", "modelo-y") is not first
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        get_embedding_backend("gpu-magico")
+
+
+def test_each_model_gets_its_own_collection():
+    assert collection_name_for("pdf_analysis", embedding_backends.DEFAULT_MODEL_NAME) == "pdf_analysis"
+    assert collection_name_for("pdf_analysis", embedding_backends.DEFAULT_STATIC_MODEL_NAME) == \
+        "pdf_analysis__static_similarity_mrl_multilingual_v1"
+
+
+def test_benchmark_reports_throughput_and_quality_deltas(fake_backends):
+    from benchmarks.embedding_benchmark import build_queries, run_benchmark
+
+    chunks = [f"documento {i} fala sobre o tema {i} com termos exclusivos alfa{i} beta{i} gama{i}" for i in range(30)]
+    queries = build_queries(chunks, n_queries=10, query_chars=40, seed=1)
+
+    results = run_benchmark(chunks, queries, ["hashing", "coarse"], reference="hashing", k=3)
+
+    reference, coarse = results
+    assert reference["recall@3_delta"] == 0 and reference["top3_overlap_with_reference"] == 1.0
+    assert reference["recall@3"] >= coarse["recall@3"]
+    assert coarse["recall@3_delta"] == round(coarse["recall@3"] - reference["recall@3"], 4)
+    assert coarse["dimension"] == 8 and coarse["docs_per_second"] > 0
@@ -0,0 +1,138 @@
+# Arquivo: tools/checkpoint_store.py
+import json
+import logging
+import os
+import shutil
+import time
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger('CheckpointStore')
+
+# Checkpoints da saída de cada passo do workflow, por (task_id, índice do passo).
+# Numa nova tentativa o Coordenador retoma do primeiro passo sem checkpoint,
+# evitando refazer a extração do PDF e os embeddings.
+CHECKPOINT_BACKEND = os.getenv("CHECKPOINT_BACKEND", "local")   # local | redis | none
+CHECKPOINT_DIR = os.getenv("CHECKPOINT_DIR", "data/checkpoints")
+CHECKPOINT_TTL_SECONDS = int(os.getenv("CHECKPOINT_TTL_SECONDS", 86400))
+# Intervalo mínimo entre varreduras de checkpoints expirados no backend local
+CHECKPOINT_SWEEP_INTERVAL_SECONDS = int(os.getenv("CHECKPOINT_SWEEP_INTERVAL_SECONDS", 3600))
+REDIS_HOST = os.getenv("REDIS_HOST", "message-broker")
+REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
+
+
+class LocalCheckpointStore:
+    """
+    Um arquivo JSON por passo em {CHECKPOINT_DIR}/{task_id}/. A expiração é
+    verificada na leitura e, para tarefas que nunca são retomadas, por uma
+    varredura periódica (disparada pelos próprios saves) que apaga os diretórios
+    cujos checkpoints já expiraram.
+    """
+
+    def __init__(self, base_dir: str = CHECKPOINT_DIR, ttl_seconds: int = CHECKPOINT_TTL_SECONDS,
+                 sweep_interval_seconds: int = CHECKPOINT_SWEEP_INTERVAL_SECONDS):
+        self.base_dir = base_dir
+        self.ttl_seconds = ttl_seconds
+        self.sweep_interval_seconds = sweep_interval_seconds
+        self._last_sweep = 0.0
+
+    def _path(self, task_id: str, step_index: int) -> str:
+        return os.path.join(self.base_dir, task_id, f"{step_index}.json")
+
+    def save(self, task_id: str, step_index: int, checkpoint: Dict[str, Any]) -> None:
+        if time.time() - self._last_sweep >= self.sweep_interval_seconds:
+            self.sweep_expired()
+        path = self._path(task_id, step_index)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        record = {"expires_at": time.time() + self.ttl_seconds, "checkpoint": checkpoint}
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(record, f)
+        os.replace(tmp_path, path)
+
+    def load(self, task_id: str, step_index: int) -> Optional[Dict[str, Any]]:
+        path = self._path(task_id, step_index)
+        try:
+            with open(path, "r") as f:
+                record = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if record.get("expires_at", 0) < time.time():
+            os.remove(path)
+            return None
+        return record.get("checkpoint")
+
+    def clear(self, task_id: str) -> None:
+        shutil.rmtree(os.path.join(self.base_dir, task_id), ignore_errors=True)
+
+    def sweep_expired(self) -> int:
+        """
+        Remove os diretórios de tarefas cujos checkpoints expiraram. Usa a data de
+        modificação dos arquivos + TTL, sem abrir os checkpoints. Retorna quantos.
+        """
+        self._last_sweep = now = time.time()
+        try:
+            task_ids = os.listdir(self.base_dir)
+        except FileNotFoundError:
+            return 0
+        removed = 0
+        for task_id in task_ids:
+            task_dir = os.path.join(self.base_dir, task_id)
+            try:
+                # Sem checkpoints (save interrompido) vale a data do próprio diretório
+                last_write = max([entry.stat().st_mtime for entry in os.scandir(task_dir)
+                                  if entry.name.endswith(".json")] or [os.path.getmtime(task_dir)])
+            except OSError:
+                continue
+            if last_write + self.ttl_seconds < now:
+                shutil.rmtree(task_dir, ignore_errors=True)
+                removed += 1
+        if removed:
+            logger.info("%d diretório(s) de checkpoints expirados removidos.", removed, extra={'task_id': '-'})
+        return removed
+
+
+class RedisCheckpointStore:
+    """Checkpoints em chaves `checkpoint:{task_id}:{passo}` com TTL; visíveis a todos os workers."""
+
+    KEY_PREFIX = "checkpoint:"
+
+    def __init__(self, redis_client, ttl_seconds: int = CHECKPOINT_TTL_SECONDS):
+        self.redis_client = redis_client
+        self.ttl_seconds = ttl_seconds
+
+    def save(self, task_id: str, step_index: int, checkpoint: Dict[str, Any]) -> None:
+        self.redis_client.set(f"{self.KEY_PREFIX}{task_id}:{step_index}", json.dumps(checkpoint), ex=self.ttl_seconds)
+
+    def load(self, task_id: str, step_index: int) -> Optional[Dict[str, Any]]:
+        raw = self.redis_client.get(f"{self.KEY_PREFIX}{task_id}:{step_index}")
+        return json.loads(raw) if raw else None
+
+    def clear(self, task_id: str) -> None:
+        # Por padrão, não por índice: um passo sem checkpoint no meio não deixa chaves órfãs
+        keys = list(self.redis_client.scan_iter(match=f"{self.KEY_PREFIX}{task_id}:*"))
+        if keys:
+            self.redis_client.delete(*keys)
+
+
+_store = None
+
+
+def get_checkpoint_store():
+    """Retorna o store configurado (ou None se CHECKPOINT_BACKEND=none)."""
+    global _store
+    if _store is None and CHECKPOINT_BACKEND != "none":
+        if CHECKPOINT_BACKEND == "redis":
+            import redis
+            _store = RedisCheckpointStore(redis.Redis(host=REDIS_HOST, port=REDIS_PORT, db=0))
+        elif CHECKPOINT_BACKEND == "local":
+            _store = LocalCheckpointStore()
+        else:
+            raise ValueError(f"Backend de checkpoint desconhecido: {CHECKPOINT_BACKEND}")
+        logger.info("Checkpoints de workflow habilitados (backend: %s).", CHECKPOINT_BACKEND, extra={'task_id': '-'})
+    return _store
+
+
+def set_checkpoint_store(store) -> None:
+    """Substitui o store global (testes ou outro destino)."""
+    global _store
+    _store = store
@@ -0,0 +1,127 @@
+# Arquivo: tools/embedding_backends.py
+import logging
+import os
+import threading
+from abc import ABC, abstractmethod
+from typing import Dict, List, Tuple
+
+logger = logging.getLogger('EmbeddingBackend')
+
+# Backend de embeddings selecionável por variável de ambiente:
+#   torch      -> SentenceTransformer em PyTorch, precisão total (padrão, comportamento original)
+#   onnx-int8  -> mesmo modelo exportado para ONNX e quantizado em int8 (ONNX Runtime, CPU)
+#   static     -> StaticEmbedding (tabela de lookup, sem transformer): várias vezes mais rápido
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+DEFAULT_MODEL_NAME = "all-MiniLM-L6-v2"
+# Documentos e perguntas são em português: o modelo estático padrão é o multilíngue.
+# O 'static-retrieval-mrl-en-v1' (só inglês) pode ser escolhido explicitamente aqui.
+DEFAULT_STATIC_MODEL_NAME = os.getenv("EMBEDDING_STATIC_MODEL",
+                                      "sentence-transformers/static-similarity-mrl-multilingual-v1")
+# Arquivo quantizado dentro do repositório do modelo no Hugging Face Hub.
+# 'quint8_avx2' roda em qualquer x86-64 moderno; use 'qint8_avx512' / 'qint8_arm64' conforme a CPU.
+EMBEDDING_ONNX_FILE = os.getenv("EMBEDDING_ONNX_FILE", "onnx/model_quint8_avx2.onnx")
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", 32))
+
+
+class EmbeddingBackend(ABC):
+    """Interface comum: transforma textos em vetores (listas de floats)."""
+
+    name = "base"
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+
+    @abstractmethod
+    def encode(self, texts: List[str]) -> List[List[float]]:
+        """Um vetor por texto, na mesma ordem."""
+
+
+class TorchEmbeddingBackend(EmbeddingBackend):
+    """SentenceTransformer em PyTorch (precisão total; usa a GPU quando disponível)."""
+
+    name = "torch"
+
+    def __init__(self, model_name: str = DEFAULT_MODEL_NAME):
+        super().__init__(model_name)
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_name)
+
+    def encode(self, texts: List[str]) -> List[List[float]]:
+        return self.model.encode(texts, batch_size=EMBEDDING_BATCH_SIZE, convert_to_tensor=False).tolist()
+
+
+class OnnxInt8EmbeddingBackend(TorchEmbeddingBackend):
+    """Mesmo modelo, executado pelo ONNX Runtime com pesos quantizados em int8."""
+
+    name = "onnx-int8"
+
+    def __init__(self, model_name: str = DEFAULT_MODEL_NAME, onnx_file: str = EMBEDDING_ONNX_FILE):
+        EmbeddingBackend.__init__(self, model_name)
+        try:
+            from sentence_transformers import SentenceTransformer
+            self.model = SentenceTransformer(
+                model_name,
+                device="cpu",
+                backend="onnx",
+                model_kwargs={"file_name": onnx_file, "provider": "CPUExecutionProvider"},
+            )
+        except ImportError as e:
+            raise RuntimeError(
+                f"Backend 'onnx-int8' requer 'sentence-transformers[onnx]' (optimum + onnxruntime): {e}"
+            ) from e
+
+
+class StaticEmbeddingBackend(TorchEmbeddingBackend):
+    """
+    Embeddings estáticos (média de vetores por token, sem atenção). Perde um pouco
+    de recall em troca de uma vazão muito maior em CPU. Gera vetores em outro espaço,
+    por isso usa uma coleção própria no ChromaDB (ver `collection_name_for`).
+    """
+
+    name = "static"
+
+    def __init__(self, model_name: str = DEFAULT_STATIC_MODEL_NAME):
+        super().__init__(model_name)
+
+
+BACKENDS = {
+    TorchEmbeddingBackend.name: TorchEmbeddingBackend,
+    OnnxInt8EmbeddingBackend.name: OnnxInt8EmbeddingBackend,
+    StaticEmbeddingBackend.name: StaticEmbeddingBackend,
+}
+
+# Um modelo por (backend, modelo) por processo: evita recarregar pesos a cada tarefa
+_backend_cache: Dict[Tuple[str, str], EmbeddingBackend] = {}
+_backend_cache_lock = threading.Lock()
+
+
+def default_model_for(backend: str) -> str:
+    return DEFAULT_STATIC_MODEL_NAME if backend == StaticEmbeddingBackend.name else DEFAULT_MODEL_NAME
+
+
+def get_embedding_backend(backend: str | None = None, model_name: str | None = None) -> EmbeddingBackend:
+    """Retorna (e guarda em cache) o backend de embeddings configurado."""
+    backend = backend or EMBEDDING_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Backend de embeddings desconhecido: {backend}. Opções: {', '.join(BACKENDS)}")
+    model_name = model_name or default_model_for(backend)
+
+    key = (backend, model_name)
+    if key not in _backend_cache:
+        with _backend_cache_lock:
+            if key not in _backend_cache:
+                _backend_cache[key] = BACKENDS[backend](model_name)
+                logger.info("Backend de embeddings '%s' carregado com o modelo %s.", backend, model_name,
+                            extra={'task_id': '-'})
+    return _backend_cache[key]
+
+
+def collection_name_for(base_name: str, model_name: str) -> str:
+    """
+    Vetores de modelos diferentes não são comparáveis, então cada modelo tem sua
+    coleção. torch e onnx-int8 do modelo padrão compartilham a coleção original.
+    """
+    if model_name == DEFAULT_MODEL_NAME:
+        return base_name
+    slug = "".join(c if c.isalnum() else "_" for c in model_name.split("/")[-1])
+    return f"{base_name}__{slug}"
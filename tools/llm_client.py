@@ -0,0 +1,356 @@
+# Arquivo: tools/llm_client.py
+import hashlib
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger('LLMClient')
+
+# --- Configuração ---
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "gemini")          # gemini | fake
+LLM_MODEL = os.getenv("LLM_MODEL", "gemini-pro")
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", 60))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 4))
+LLM_BACKOFF_BASE_SECONDS = float(os.getenv("LLM_BACKOFF_BASE_SECONDS", 1.0))
+LLM_BACKOFF_MAX_SECONDS = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", 30.0))
+# Limite global (todos os workers) de requisições por minuto; 0 desativa
+LLM_RATE_LIMIT_PER_MINUTE = float(os.getenv("LLM_RATE_LIMIT_PER_MINUTE", 60))
+LLM_RATE_LIMIT_BURST = int(os.getenv("LLM_RATE_LIMIT_BURST", 10))
+# Dispara uma requisição duplicada se a primeira não responder neste prazo; 0 desativa
+LLM_HEDGE_AFTER_SECONDS = float(os.getenv("LLM_HEDGE_AFTER_SECONDS", 0))
+# Chamadas simultâneas ao LLM esperadas por processo e limite de cópias "hedged"
+# em andamento (inclusive as perdedoras, que não podem ser interrompidas)
+LLM_MAX_CONCURRENT_CALLS = int(os.getenv("LLM_MAX_CONCURRENT_CALLS", 4))
+LLM_MAX_HEDGES_IN_FLIGHT = int(os.getenv("LLM_MAX_HEDGES_IN_FLIGHT", 4))
+
+REDIS_HOST = os.getenv("REDIS_HOST", "message-broker")
+REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
+RATE_LIMIT_KEY = "llm:token_bucket"
+
+# Códigos HTTP que valem nova tentativa (quota, sobrecarga, falhas transitórias)
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+class LLMError(RuntimeError):
+    """Falha definitiva ao chamar o LLM (não retentável ou tentativas esgotadas)."""
+
+
+class TransientLLMError(Exception):
+    """Erro retentável com código HTTP, no mesmo formato de google.api_core.exceptions."""
+
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+
+
+class LLMResponse:
+    def __init__(self, text: str, usage: Optional[Dict[str, int]] = None):
+        self.text = text
+        self.usage = usage or {}
+
+
+# --- Provedores ---
+
+class GeminiProvider:
+    """Google Gemini via google-generativeai (importado só quando usado)."""
+
+    name = "gemini"
+
+    def __init__(self, model_name: str = LLM_MODEL):
+        import google.generativeai as genai
+        genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+        self.model_name = model_name
+        self.model = genai.GenerativeModel(model_name=model_name)
+
+    def generate(self, prompt: str, timeout: float) -> LLMResponse:
+        response = self.model.generate_content(prompt, request_options={"timeout": timeout})
+        usage = getattr(response, 'usage_metadata', None)
+        return LLMResponse(response.text, {
+            "prompt_tokens": getattr(usage, 'prompt_token_count', None),
+            "completion_tokens": getattr(usage, 'candidates_token_count', None),
+            "total_tokens": getattr(usage, 'total_token_count', None),
+        } if usage is not None else None)
+
+
+class FakeProvider:
+    """
+    Provedor local, sem rede, para testes e testes de carga. Latência e taxa de
+    falhas (erros 503 retentáveis) controladas por FAKE_LLM_LATENCY_SECONDS e
+    FAKE_LLM_FAILURE_RATE.
+    """
+
+    name = "fake"
+
+    def __init__(self, model_name: str = "fake-llm", latency: float | None = None, failure_rate: float | None = None):
+        self.model_name = model_name
+        self.latency = float(os.getenv("FAKE_LLM_LATENCY_SECONDS", 0.05)) if latency is None else latency
+        self.failure_rate = float(os.getenv("FAKE_LLM_FAILURE_RATE", 0)) if failure_rate is None else failure_rate
+
+    def generate(self, prompt: str, timeout: float) -> LLMResponse:
+        time.sleep(min(self.latency, timeout))
+        if self.latency > timeout:
+            raise TimeoutError(f"Fake LLM excedeu o timeout de {timeout}s")
+        if random.random() < self.failure_rate:
+            raise TransientLLMError(503, "Fake LLM indisponível")
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:12]
+        prompt_tokens = len(prompt.split())
+        return LLMResponse(f"Resposta simulada ({digest}).",
+                           {"prompt_tokens": prompt_tokens, "completion_tokens": 3, "total_tokens": prompt_tokens + 3})
+
+
+PROVIDERS = {
+    GeminiProvider.name: GeminiProvider,
+    FakeProvider.name: FakeProvider,
+}
+
+
+def is_retryable(error: Exception) -> bool:
+    """Erros de quota (429), 5xx e timeouts/conexão são transitórios."""
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    # google.api_core.exceptions.GoogleAPICallError expõe o status HTTP em `.code`
+    code = getattr(error, 'code', None)
+    if callable(code):
+        code = None
+    return isinstance(code, int) and code in RETRYABLE_STATUS_CODES
+
+
+# --- Limitação de Taxa ---
+
+class LocalTokenBucket:
+    """Token bucket em memória (um processo). Usado se o Redis não estiver acessível."""
+
+    def __init__(self, rate_per_second: float, capacity: int):
+        self.rate = rate_per_second
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> float:
+        """Consome um token. Retorna 0 se conseguiu, ou quantos segundos esperar."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+
+# Refil + consumo atômicos no Redis: o mesmo bucket vale para todos os workers
+_TOKEN_BUCKET_LUA = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(state[1]) or capacity
+local updated_at = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated_at) * rate)
+local wait = 0
+if tokens >= 1 then
+  tokens = tokens - 1
+else
+  wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated_at', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 60)
+return tostring(wait)
+"""
+
+
+class RedisTokenBucket:
+    """
+    Token bucket compartilhado entre workers via script Lua no Redis. Se o Redis
+    falhar, cai para um bucket local até voltar, em vez de falhar a chamada ao LLM.
+    """
+
+    def __init__(self, redis_client, rate_per_second: float, capacity: int, key: str = RATE_LIMIT_KEY):
+        self.redis_client = redis_client
+        self.rate = rate_per_second
+        self.capacity = capacity
+        self.key = key
+        self._script = redis_client.register_script(_TOKEN_BUCKET_LUA)
+        self.fallback = LocalTokenBucket(rate_per_second, capacity)
+        self._redis_down = False
+
+    def try_acquire(self) -> float:
+        import redis
+        try:
+            wait_seconds = float(self._script(keys=[self.key], args=[self.rate, self.capacity, time.time()]))
+        except redis.exceptions.RedisError as e:
+            if not self._redis_down:
+                logger.warning("Redis indisponível para o rate limit do LLM (%s); usando limite local.", e,
+                               extra={'task_id': '-'})
+                self._redis_down = True
+            return self.fallback.try_acquire()
+        if self._redis_down:
+            logger.info("Rate limit do LLM de volta ao Redis.", extra={'task_id': '-'})
+            self._redis_down = False
+        return wait_seconds
+
+
+def acquire_token(bucket, deadline: float) -> None:
+    """Bloqueia até obter um token ou até o prazo; neste caso levanta TimeoutError."""
+    while True:
+        wait_seconds = bucket.try_acquire()
+        if wait_seconds <= 0:
+            return
+        if time.monotonic() + wait_seconds > deadline:
+            raise TimeoutError("Limite de taxa do LLM: token não obtido dentro do prazo")
+        time.sleep(wait_seconds)
+
+
+def build_rate_limiter():
+    """Usa o Redis quando disponível; senão cai para um bucket local."""
+    if LLM_RATE_LIMIT_PER_MINUTE <= 0:
+        return None
+    rate = LLM_RATE_LIMIT_PER_MINUTE / 60.0
+    try:
+        import redis
+        redis_client = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, db=0, socket_connect_timeout=1)
+        redis_client.ping()
+        return RedisTokenBucket(redis_client, rate, LLM_RATE_LIMIT_BURST)
+    except Exception as e:
+        logger.warning("Redis indisponível para o rate limit do LLM (%s); usando limite local.", e,
+                       extra={'task_id': '-'})
+        return LocalTokenBucket(rate, LLM_RATE_LIMIT_BURST)
+
+
+# --- Cliente ---
+
+class LLMClient:
+    """
+    Camada única de acesso ao LLM: limitação de taxa, retentativas com backoff
+    exponencial (com jitter) para erros transitórios e, opcionalmente, requisições
+    "hedged" (uma cópia é disparada se a primeira demorar demais; vence a primeira
+    resposta). A cópia perdedora não pode ser interrompida: cada uma ocupa uma
+    das `max_hedges_in_flight` vagas até terminar e, sem vaga, a tentativa segue
+    sem hedge. Assim as retardatárias nunca ocupam as threads das novas chamadas.
+    """
+
+    def __init__(self, provider, rate_limiter=None, max_retries: int = LLM_MAX_RETRIES,
+                 timeout: float = LLM_TIMEOUT_SECONDS, hedge_after: float = LLM_HEDGE_AFTER_SECONDS,
+                 backoff_base: float = LLM_BACKOFF_BASE_SECONDS, backoff_max: float = LLM_BACKOFF_MAX_SECONDS,
+                 max_concurrent_calls: int = LLM_MAX_CONCURRENT_CALLS,
+                 max_hedges_in_flight: int = LLM_MAX_HEDGES_IN_FLIGHT):
+        self.provider = provider
+        self.rate_limiter = rate_limiter
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.hedge_after = hedge_after
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._executor = None
+        if hedge_after > 0:
+            # Uma thread por chamada primária mais uma por cópia hedged permitida
+            self._executor = ThreadPoolExecutor(max_workers=max_concurrent_calls + max_hedges_in_flight,
+                                                thread_name_prefix="llm-hedge")
+        self._hedge_slots = threading.BoundedSemaphore(max(1, max_hedges_in_flight))
+
+    @property
+    def model_name(self) -> str:
+        return self.provider.model_name
+
+    def generate(self, prompt: str, task_id: str = '-', deadline: float | None = None,
+                 cancel_check: Callable[[], None] | None = None) -> LLMResponse:
+        """
+        Gera a resposta para o prompt. `deadline` (time.monotonic) limita o tempo
+        total, incluindo espera por tokens e backoff. `cancel_check` é chamado antes
+        de cada tentativa e pode levantar uma exceção para interromper (ela não é
+        tratada aqui). Levanta LLMError em falha.
+        """
+        extra_data = {'task_id': task_id}
+        deadline = deadline or time.monotonic() + self.timeout * (self.max_retries + 1)
+        last_error: Exception | None = None
+
+        for attempt in range(self.max_retries + 1):
+            if cancel_check:
+                cancel_check()
+            try:
+                return self._attempt(prompt, deadline)
+            except Exception as e:
+                last_error = e
+                if not is_retryable(e) or attempt == self.max_retries:
+                    break
+                # Backoff exponencial com "full jitter"
+                delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+                if time.monotonic() + delay >= deadline:
+                    break
+                logger.warning("Erro transitório do LLM (tentativa %d/%d): %s. Nova tentativa em %.1fs.",
+                               attempt + 1, self.max_retries + 1, e, delay, extra=extra_data)
+                time.sleep(delay)
+
+        raise LLMError(f"Falha ao chamar o LLM ({self.provider.name}): {last_error}") from last_error
+
+    def _call(self, prompt: str, deadline: float) -> LLMResponse:
+        if self.rate_limiter:
+            acquire_token(self.rate_limiter, deadline)
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError("Prazo do LLM esgotado")
+        return self.provider.generate(prompt, timeout=min(self.timeout, remaining))
+
+    def _attempt(self, prompt: str, deadline: float) -> LLMResponse:
+        if not self._executor:
+            return self._call(prompt, deadline)
+
+        primary = self._executor.submit(self._call, prompt, deadline)
+        done, _ = wait([primary], timeout=self.hedge_after)
+        if done:
+            return primary.result()
+
+        # Retardatárias demais em andamento: segue só com a primeira requisição
+        if not self._hedge_slots.acquire(blocking=False):
+            return primary.result()
+
+        # A primeira requisição está lenta: dispara a cópia e fica com a que responder antes
+        hedge = self._executor.submit(self._call, prompt, deadline)
+        pending = {primary, hedge}
+        error: Exception | None = None
+        try:
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future.exception() is None:
+                        for other in pending:
+                            other.cancel()
+                        return future.result()
+                    error = future.exception()
+            raise error
+        finally:
+            # A vaga só é liberada quando a perdedora (se ainda rodando) terminar
+            straggler = next((future for future in pending if not future.done()), None)
+            if straggler:
+                straggler.add_done_callback(lambda _: self._hedge_slots.release())
+            else:
+                self._hedge_slots.release()
+
+
+_client: LLMClient | None = None
+_client_lock = threading.Lock()
+
+
+def get_llm_client() -> LLMClient:
+    """Cliente compartilhado do processo (provedor e rate limiter criados uma vez)."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                provider_class = PROVIDERS.get(LLM_PROVIDER)
+                if not provider_class:
+                    raise ValueError(f"Provedor de LLM desconhecido: {LLM_PROVIDER}. Opções: {', '.join(PROVIDERS)}")
+                provider = provider_class(LLM_MODEL) if provider_class is GeminiProvider else provider_class()
+                _client = LLMClient(provider, rate_limiter=build_rate_limiter())
+    return _client
+
+
+def set_llm_client(client: LLMClient | None) -> None:
+    """Substitui o cliente compartilhado (testes ou provedores customizados)."""
+    global _client
+    _client = client
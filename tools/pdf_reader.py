@@ -4,6 +4,8 @@ from typing import List, Dict
 import logging
 import os
 
+from tools.tracing import start_span
+
 logger = logging.getLogger('PDFReaderTool')
 
 class PDFReaderTool:
@@ -24,11 +26,13 @@ class PDFReaderTool:
 
         text = ""
         try:
-            reader = PdfReader(file_path)
-            
-            # Extrai o texto de todas as páginas
-            for page in reader.pages:
-                text += page.extract_text() or ""
+            with start_span("pdf.extract", **{"pdf.file_path": file_path}) as span:
+                reader = PdfReader(file_path)
+                
+                # Extrai o texto de todas as páginas
+                for page in reader.pages:
+                    text += page.extract_text() or ""
+                span.set_attributes(**{"pdf.page_count": len(reader.pages), "pdf.char_count": len(text)})
                 
             logger.info("Extração de texto concluída. Total de caracteres: %d", len(text), extra=extra_data)
             return text
@@ -45,18 +49,20 @@ class PDFReaderTool:
         """
         
         # Implementação básica de chunking (pode ser substituída por frameworks como LangChain/LlamaIndex)
-        chunks = []
-        start = 0
-        text_length = len(text)
-        
-        while start < text_length:
-            end = start + chunk_size
-            chunk = text[start:end]
-            chunks.append(chunk)
+        with start_span("pdf.chunk", **{"chunk.size": chunk_size, "chunk.overlap": overlap}) as span:
+            chunks = []
+            start = 0
+            text_length = len(text)
             
-            # Move o ponteiro de início com sobreposição
-            start += chunk_size - overlap
-            if start < 0:
-                start = 0
+            while start < text_length:
+                end = start + chunk_size
+                chunk = text[start:end]
+                chunks.append(chunk)
+                
+                # Move o ponteiro de início com sobreposição
+                start += chunk_size - overlap
+                if start < 0:
+                    start = 0
+            span.set_attributes(**{"pdf.char_count": text_length, "chunk.count": len(chunks)})
                 
         return chunks
\ No newline at end of file
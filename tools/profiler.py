@@ -0,0 +1,128 @@
+# Arquivo: tools/profiler.py
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Dict, Any, List
+
+logger = logging.getLogger('TaskProfiler')
+
+# Perfilamento opcional de uma tarefa (CPU via cProfile + memória via tracemalloc).
+# Ativado por tarefa com `"profile": true` no payload, ou para todas com PROFILE_TASKS=true.
+# Tarefas não perfiladas nem chegam a instanciar esta classe.
+PROFILE_TASKS = os.getenv("PROFILE_TASKS", "false").lower() in ("1", "true", "yes")
+PROFILE_TOP_N = int(os.getenv("PROFILE_TOP_N", 25))
+
+
+def should_profile(task_payload: Dict[str, Any]) -> bool:
+    """Decide se a tarefa deve rodar sob o profiler."""
+    flag = task_payload.get("profile")
+    if flag is None:
+        return PROFILE_TASKS
+    return str(flag).lower() in ("1", "true", "yes")
+
+
+class TaskProfiler:
+    """
+    Mede cada passo do pipeline separadamente (tempo de parede, CPU, alocações)
+    e salva os artefatos ao lado do relatório, em `output_dir`:
+      - {task_id}.profile.prof  -> estatísticas cProfile agregadas (pstats / snakeviz)
+      - {task_id}.profile.json  -> resumo por passo + top-N funções e alocações
+    """
+
+    def __init__(self, task_id: str, output_dir: str, top_n: int = PROFILE_TOP_N):
+        self.task_id = task_id
+        self.output_dir = output_dir
+        self.top_n = top_n
+        self.steps: List[Dict[str, Any]] = []
+        self._profiles: List[cProfile.Profile] = []
+        self._started_tracemalloc = False
+        self._start_wall = 0.0
+
+    def start(self) -> None:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        self._start_wall = time.perf_counter()
+
+    @contextmanager
+    def step(self, step_index: int, agent_name: str, command: str):
+        """Perfila um único passo do workflow."""
+        profile = cProfile.Profile()
+        tracemalloc.reset_peak()
+        mem_before, _ = tracemalloc.get_traced_memory()
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            wall, cpu = time.perf_counter() - wall_start, time.process_time() - cpu_start
+            mem_after, mem_peak = tracemalloc.get_traced_memory()
+            self._profiles.append(profile)
+            self.steps.append({
+                "step_index": step_index,
+                "agent": agent_name,
+                "command": command,
+                "wall_seconds": round(wall, 6),
+                "cpu_seconds": round(cpu, 6),
+                "memory_delta_bytes": mem_after - mem_before,
+                "memory_peak_bytes": mem_peak,
+                "top_functions": self._top_functions(profile),
+                "top_allocations": self._top_allocations(),
+            })
+
+    def _top_functions(self, profile: cProfile.Profile) -> List[Dict[str, Any]]:
+        stats = pstats.Stats(profile, stream=io.StringIO())
+        rows = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:self.top_n]
+        return [{
+            "function": f"{filename}:{lineno}({name})",
+            "calls": nc,
+            "total_seconds": round(tt, 6),
+            "cumulative_seconds": round(ct, 6),
+        } for (filename, lineno, name), (cc, nc, tt, ct, _) in rows]
+
+    def _top_allocations(self) -> List[Dict[str, Any]]:
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+        return [{
+            "location": str(stat.traceback),
+            "size_bytes": stat.size,
+            "count": stat.count,
+        } for stat in snapshot.statistics('lineno')[:self.top_n]]
+
+    def stop_and_save(self, status: str | None = None) -> Dict[str, str]:
+        """Encerra a coleta e grava os artefatos. Retorna os caminhos gerados."""
+        extra_data = {'task_id': self.task_id}
+        total_wall = time.perf_counter() - self._start_wall
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        prof_path = os.path.join(self.output_dir, f"{self.task_id}.profile.prof")
+        summary_path = os.path.join(self.output_dir, f"{self.task_id}.profile.json")
+
+        if self._profiles:
+            combined = pstats.Stats(self._profiles[0], stream=io.StringIO())
+            for profile in self._profiles[1:]:
+                combined.add(profile)
+            combined.dump_stats(prof_path)
+
+        summary = {
+            "task_id": self.task_id,
+            "status": status,
+            "total_wall_seconds": round(total_wall, 6),
+            "steps": self.steps,
+        }
+        with open(summary_path, "w") as f:
+            json.dump(summary, f, indent=2)
+
+        logger.info("Perfil da tarefa salvo em %s e %s.", summary_path, prof_path, extra=extra_data)
+        return {"summary": summary_path, "cprofile": prof_path}
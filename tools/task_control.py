@@ -0,0 +1,69 @@
+# Arquivo: tools/task_control.py
+import contextvars
+import time
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+
+class TaskCancelled(Exception):
+    """A tarefa foi cancelada pelo cliente (DELETE /api/task/{task_id})."""
+
+
+class DeadlineExceeded(TaskCancelled):
+    """O prazo final da tarefa (definido pelo API Gateway) passou."""
+
+
+class TaskControl:
+    """
+    Prazo (epoch, vindo do payload) e sinal de cancelamento de uma tarefa.
+    O Coordenador verifica entre os passos; embeddings e LLM verificam entre
+    lotes/tentativas, para que trabalho abandonado pare de consumir capacidade.
+    """
+
+    def __init__(self, deadline: Optional[float] = None, is_cancelled: Optional[Callable[[], bool]] = None):
+        self.deadline = deadline
+        self.is_cancelled = is_cancelled
+
+    def remaining(self) -> Optional[float]:
+        """Segundos até o prazo (None se a tarefa não tem prazo)."""
+        return None if self.deadline is None else self.deadline - time.time()
+
+    def monotonic_deadline(self) -> Optional[float]:
+        """O mesmo prazo no relógio de time.monotonic() (usado pelo cliente do LLM)."""
+        remaining = self.remaining()
+        return None if remaining is None else time.monotonic() + remaining
+
+    def expired(self) -> bool:
+        remaining = self.remaining()
+        return remaining is not None and remaining <= 0
+
+    def check(self) -> None:
+        """Levanta TaskCancelled/DeadlineExceeded se a tarefa não deve continuar."""
+        if self.expired():
+            raise DeadlineExceeded("Prazo da tarefa esgotado.")
+        if self.is_cancelled and self.is_cancelled():
+            raise TaskCancelled("Tarefa cancelada pelo cliente.")
+
+
+_current_control: contextvars.ContextVar[Optional[TaskControl]] = contextvars.ContextVar("task_control", default=None)
+
+
+@contextmanager
+def task_control_scope(control: TaskControl):
+    """Torna `control` o controle corrente durante a execução da tarefa."""
+    token = _current_control.set(control)
+    try:
+        yield control
+    finally:
+        _current_control.reset(token)
+
+
+def current_task_control() -> Optional[TaskControl]:
+    return _current_control.get()
+
+
+def check_current_task() -> None:
+    """Ponto de verificação para agentes e ferramentas; sem efeito fora de uma tarefa."""
+    control = _current_control.get()
+    if control:
+        control.check()
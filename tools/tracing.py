@@ -0,0 +1,234 @@
+# Arquivo: tools/tracing.py
+import atexit
+import contextvars
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger('Tracing')
+
+# Rastreamento leve por tarefa. Cada span registra início/fim e atributos
+# (páginas, chunks, tokens...) e é exportado em JSON Lines compatível com OTLP
+# (um ExportTraceServiceRequest por linha), por uma thread separada.
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "true").lower() in ("1", "true", "yes")
+TRACE_FILE = os.getenv("TRACE_FILE", "data/traces/spans.jsonl")
+SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "agent-backend")
+TRACE_QUEUE_SIZE = int(os.getenv("TRACE_QUEUE_SIZE", 10000))
+# Rotação do arquivo de trace, como o RotatingFileHandler dos logs (0 desativa)
+TRACE_MAX_BYTES = int(os.getenv("TRACE_MAX_BYTES", 10485760))  # 10MB
+TRACE_BACKUP_COUNT = int(os.getenv("TRACE_BACKUP_COUNT", 5))
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """Um intervalo de tempo nomeado dentro do trace de uma tarefa."""
+
+    def __init__(self, name: str, trace_id: str, parent_span_id: Optional[str], attributes: Dict[str, Any]):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_span_id = parent_span_id
+        self.attributes = dict(attributes)
+        self.start_time_ns = time.time_ns()
+        self.end_time_ns: Optional[int] = None
+        self.error: Optional[str] = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def set_attributes(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    def to_otlp(self) -> Dict[str, Any]:
+        """Serializa o span no formato JSON do OTLP (campos camelCase)."""
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 1,  # SPAN_KIND_INTERNAL
+            "startTimeUnixNano": str(self.start_time_ns),
+            "endTimeUnixNano": str(self.end_time_ns or time.time_ns()),
+            "attributes": [_otlp_attribute(k, v) for k, v in self.attributes.items() if v is not None],
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 1},
+        }
+        if self.parent_span_id:
+            span["parentSpanId"] = self.parent_span_id
+        return span
+
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+class JsonLinesSpanExporter:
+    """
+    Exportador não bloqueante: `export` apenas enfileira o span; uma thread daemon
+    agrupa os spans pendentes e grava uma linha OTLP por lote no arquivo de trace.
+    Se a fila estiver cheia o span é descartado (e contabilizado), nunca a tarefa.
+    Ao passar de `max_bytes` o arquivo é rotacionado (spans.jsonl.1, .2, ...).
+    """
+
+    def __init__(self, file_path: str = TRACE_FILE, max_queue_size: int = TRACE_QUEUE_SIZE,
+                 max_bytes: int = TRACE_MAX_BYTES, backup_count: int = TRACE_BACKUP_COUNT):
+        self.file_path = file_path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.dropped_spans = 0
+        self._queue: "queue.Queue[Optional[Span]]" = queue.Queue(maxsize=max_queue_size)
+        self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, span: Span) -> None:
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped_spans += 1
+
+    def flush(self, timeout: float = 5.0) -> None:
+        """Aguarda até que os spans já enfileirados tenham sido gravados."""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def shutdown(self) -> None:
+        self.flush()
+        try:
+            self._queue.put_nowait(None)
+        except queue.Full:
+            pass
+
+    def _run(self) -> None:
+        while True:
+            span = self._queue.get()
+            if span is None:
+                self._queue.task_done()
+                return
+            batch = [span]
+            stop = False
+            # Drena o que mais estiver pendente para gravar em uma única linha
+            while len(batch) < 512:
+                try:
+                    next_span = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if next_span is None:
+                    self._queue.task_done()
+                    stop = True
+                    break
+                batch.append(next_span)
+            try:
+                self._write(batch)
+            except Exception as e:
+                logger.warning("Falha ao exportar %d spans: %s", len(batch), e, extra={'task_id': '-'})
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if stop:
+                return
+
+    def _write(self, batch: List[Span]) -> None:
+        request = {
+            "resourceSpans": [{
+                "resource": {"attributes": [_otlp_attribute("service.name", SERVICE_NAME)]},
+                "scopeSpans": [{
+                    "scope": {"name": "mmas.tracing"},
+                    "spans": [span.to_otlp() for span in batch],
+                }],
+            }]
+        }
+        line = json.dumps(request) + "\n"
+        os.makedirs(os.path.dirname(self.file_path) or '.', exist_ok=True)
+        if self.max_bytes > 0 and os.path.exists(self.file_path) and \
+                os.path.getsize(self.file_path) + len(line) > self.max_bytes:
+            self._rotate()
+        with open(self.file_path, "a", encoding="utf-8") as f:
+            f.write(line)
+
+    def _rotate(self) -> None:
+        """Mesmo esquema do RotatingFileHandler: o arquivo atual vira .1, o .1 vira .2..."""
+        if self.backup_count <= 0:
+            os.remove(self.file_path)
+            return
+        for index in range(self.backup_count - 1, 0, -1):
+            source = f"{self.file_path}.{index}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.file_path}.{index + 1}")
+        os.replace(self.file_path, f"{self.file_path}.1")
+
+
+_exporter: Optional[JsonLinesSpanExporter] = None
+_exporter_lock = threading.Lock()
+
+
+def get_exporter() -> JsonLinesSpanExporter:
+    """Retorna o exportador global, criando-o (e a sua thread) no primeiro uso."""
+    global _exporter
+    if _exporter is None:
+        with _exporter_lock:
+            if _exporter is None:
+                _exporter = JsonLinesSpanExporter()
+                atexit.register(_exporter.shutdown)
+    return _exporter
+
+
+def set_exporter(exporter: Optional[JsonLinesSpanExporter]) -> None:
+    """Substitui o exportador global (usado em testes ou para outro destino)."""
+    global _exporter
+    _exporter = exporter
+
+
+@contextmanager
+def start_span(name: str, **attributes: Any):
+    """
+    Abre um span filho do span corrente (ou a raiz de um novo trace).
+    Uso: `with start_span("pdf.extract", file_path=path) as span: span.set_attribute(...)`
+    """
+    if not TRACING_ENABLED:
+        yield _NOOP_SPAN
+        return
+
+    parent = _current_span.get()
+    trace_id = parent.trace_id if parent else uuid.uuid4().hex
+    span = Span(name, trace_id, parent.span_id if parent else None, attributes)
+    token = _current_span.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        span.end_time_ns = time.time_ns()
+        _current_span.reset(token)
+        get_exporter().export(span)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+class _NoopSpan:
+    """Span sem efeito, retornado quando o tracing está desabilitado."""
+
+    error = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def set_attributes(self, **attributes: Any) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
@@ -1,16 +1,21 @@
 # Arquivo: tools/vector_db_tool.py
 # Arquivo: tools/vector_db_tool.py
 import chromadb
-from sentence_transformers import SentenceTransformer
 from typing import List, Dict, Any
 import logging
 import os
 
+from tools.tracing import start_span
+from tools.task_control import check_current_task, TaskCancelled
+from tools.embedding_backends import get_embedding_backend, default_model_for, collection_name_for, EMBEDDING_BACKEND
+
 logger = logging.getLogger('VectorDBTool')
 
 # O caminho para salvar a base de dados Chroma
 DB_PATH = "data/vector_store"
 COLLECTION_NAME = "pdf_analysis"
+# Textos por lote de encode; entre lotes verifica-se prazo/cancelamento da tarefa
+ENCODE_BATCH_SIZE = int(os.getenv("ENCODE_BATCH_SIZE", 256))
 
 class VectorDBTool:
     """
@@ -18,19 +23,22 @@ class VectorDBTool:
     Utilizada para RAG (Retrieval Augmented Generation).
     """
 
-    def __init__(self, model_name: str = 'all-MiniLM-L6-v2'):
+    def __init__(self, model_name: str | None = None, backend: str | None = None):
         # Inicializa o cliente ChromaDB
         self.client = chromadb.PersistentClient(path=DB_PATH)
         
-        # Inicializa o modelo de embeddings
-        self.model = SentenceTransformer(model_name)
+        # Inicializa o backend de embeddings (torch, onnx-int8 ou static; carregado uma vez por processo)
+        backend = backend or EMBEDDING_BACKEND
+        self.embedder = get_embedding_backend(backend, model_name or default_model_for(backend))
         
-        # Obtém ou cria a coleção
+        # Obtém ou cria a coleção (uma por modelo, pois os espaços vetoriais diferem)
+        self.collection_name = collection_name_for(COLLECTION_NAME, self.embedder.model_name)
         self.collection = self.client.get_or_create_collection(
-            name=COLLECTION_NAME,
+            name=self.collection_name,
             embedding_function=None  # Vamos fornecer os embeddings manualmente
         )
-        logger.info("Cliente ChromaDB inicializado e coleção '%s' carregada.", COLLECTION_NAME)
+        logger.info("Cliente ChromaDB inicializado e coleção '%s' carregada (embeddings: %s).",
+                    self.collection_name, self.embedder.name)
 
     def add_documents(self, texts: List[str], task_id: str, document_id: str) -> None:
         """
@@ -39,7 +47,11 @@ class VectorDBTool:
         extra_data = {'task_id': task_id}
         
         try:
-            embeddings = self.model.encode(texts, convert_to_tensor=False).tolist()
+            with start_span("embedding.encode", **{"embedding.text_count": len(texts), "embedding.backend": self.embedder.name}):
+                embeddings = []
+                for start in range(0, len(texts), ENCODE_BATCH_SIZE):
+                    check_current_task()
+                    embeddings.extend(self.embedder.encode(texts[start:start + ENCODE_BATCH_SIZE]))
             
             # Gera IDs únicos para cada documento
             doc_ids = [f"{task_id}-{document_id}-{i}" for i in range(len(texts))]
@@ -49,14 +61,17 @@ class VectorDBTool:
                 "task": task_id
             } for _ in texts]
             
-            self.collection.add(
-                embeddings=embeddings,
-                documents=texts,
-                metadatas=metadatas,
-                ids=doc_ids
-            )
+            with start_span("chroma.add", **{"chroma.collection": self.collection_name, "chroma.document_count": len(texts)}):
+                self.collection.add(
+                    embeddings=embeddings,
+                    documents=texts,
+                    metadatas=metadatas,
+                    ids=doc_ids
+                )
             
-            logger.info("Adicionado %d documentos à coleção '%s'.", len(texts), COLLECTION_NAME, extra=extra_data)
+            logger.info("Adicionado %d documentos à coleção '%s'.", len(texts), self.collection_name, extra=extra_data)
+        except TaskCancelled:
+            raise
         except Exception as e:
             logger.error("Falha ao adicionar documentos ao ChromaDB: %s", str(e), extra=extra_data)
             raise RuntimeError(f"ChromaDB add failure: {e}")
@@ -68,12 +83,16 @@ class VectorDBTool:
         extra_data = {'task_id': task_id}
         
         try:
-            query_embedding = self.model.encode([query], convert_to_tensor=False).tolist()
+            check_current_task()
+            with start_span("embedding.encode", **{"embedding.text_count": 1, "embedding.backend": self.embedder.name}):
+                query_embedding = self.embedder.encode([query])
             
-            results = self.collection.query(
-                query_embeddings=query_embedding,
-                n_results=n_results
-            )
+            with start_span("chroma.query", **{"chroma.collection": self.collection_name, "chroma.n_results": n_results}) as span:
+                results = self.collection.query(
+                    query_embeddings=query_embedding,
+                    n_results=n_results
+                )
+                span.set_attribute("chroma.result_count", len(results['documents'][0]) if results and results['documents'] else 0)
             
             # Formata os resultados para o formato esperado
             formatted_results = []
@@ -87,6 +106,8 @@ class VectorDBTool:
             logger.info("Busca concluída. Retornando %d resultados.", len(formatted_results), extra=extra_data)
             return formatted_results
             
+        except TaskCancelled:
+            raise
         except Exception as e:
             logger.error("Falha na busca no ChromaDB: %s", str(e), extra=extra_data)
             return [] # Retorna lista vazia em caso de falha
\ No newline at end of file